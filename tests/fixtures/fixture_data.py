@@ -9,6 +9,9 @@ from posts.models import Post, Group
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # Миниатюры сразу: фоновый поток иначе дописывал бы файлы
+        # в каталог, который фикстура уже удаляет.
+        settings.THUMBNAIL_ASYNC = False
         yield temp_directory
 
 
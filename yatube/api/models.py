@@ -0,0 +1,31 @@
+import hashlib
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class Token(models.Model):
+    """Токен доступа к API для клиентов без сессии и CSRF-cookie.
+
+    Ключ показывается клиенту один раз, в базе хранится только его
+    SHA-256.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='api_tokens')
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=100, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def issue(cls, user, name=''):
+        """Создаёт токен; возвращает ключ для заголовка Authorization."""
+        key = secrets.token_urlsafe(32)
+        cls.objects.create(user=user, digest=digest(key), name=name)
+        return key
@@ -0,0 +1,96 @@
+"""Сериализация ответов API без создания экземпляров моделей.
+
+Для каждого набора полей (?fields=) один раз собирается Serializer:
+список столбцов для values_list, имена полей и конвертеры. Строка
+превращается в словарь одним dict(zip(...)), а ненужные столбцы —
+например text или image — не выбираются из базы вовсе. Столбцы ключа
+курсора идут последними и в ответ не попадают, если их не просили.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+
+class Field:
+    def __init__(self, source=None, convert=None):
+        self.source = source
+        self.convert = convert
+
+
+def media_url(name):
+    return settings.MEDIA_URL + name if name else None
+
+
+RESOURCES = {
+    'posts': {
+        'id': Field(),
+        'text': Field(),
+        'pub_date': Field(),
+        'author': Field('author__username'),
+        'group': Field('group__slug'),
+        'image': Field(convert=media_url),
+        'image_width': Field(),
+        'image_height': Field(),
+        'comment_count': Field(),
+    },
+    'comments': {
+        'id': Field(),
+        'post': Field('post_id'),
+        'author': Field('author__username'),
+        'text': Field(),
+        'created': Field(),
+    },
+    'groups': {
+        'id': Field(),
+        'title': Field(),
+        'slug': Field(),
+        'description': Field(),
+        'post_count': Field(),
+    },
+    'follows': {
+        'user': Field('user__username'),
+        'author': Field('author__username'),
+    },
+}
+
+
+class Serializer:
+    """Сериализатор выбранных полей ресурса."""
+
+    def __init__(self, resource, fields, keys):
+        spec = RESOURCES[resource]
+        self.names = fields
+        self.columns = tuple(
+            spec[name].source or name for name in fields) + keys
+        self.converters = tuple(
+            (name, spec[name].convert) for name in fields
+            if spec[name].convert)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def __call__(self, row):
+        item = dict(zip(self.names, row))
+        for name, convert in self.converters:
+            item[name] = convert(item[name])
+        return item
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(resource, fields, keys=()):
+    return Serializer(resource, fields, keys)
+
+
+def parse_fields(resource, value):
+    """Поля из ?fields=a,b; ValueError для неизвестных и пустого
+    списка."""
+    if not value:
+        return tuple(RESOURCES[resource])
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    if not fields:
+        raise ValueError('В fields не указано ни одного поля')
+    unknown = set(fields) - set(RESOURCES[resource])
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
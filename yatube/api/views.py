@@ -0,0 +1,333 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import router
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, QueryDict
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from core.db.routers import read_from_replica
+from core.instrumentation import query_budget
+from core.ratelimit import rate_limit
+from posts import thumbnails
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator, InvalidCursor
+
+from .models import Token, digest
+from .serializers import compile_serializer, parse_fields
+
+TOKEN_KEYWORDS = ('bearer', 'token')
+
+
+class RowCursorPaginator(CursorPaginator):
+    """Курсорная пагинация строк values_list: ключ — последние столбцы."""
+
+    def _values(self, row):
+        return row[-len(self.keys):]
+
+
+def error(status, message):
+    if isinstance(message, dict):
+        return JsonResponse({'errors': message}, status=status)
+    return JsonResponse({'detail': message}, status=status)
+
+
+def too_many_requests(request, retry_after):
+    return error(429, f'Слишком много запросов, повторите через '
+                      f'{retry_after} с')
+
+
+def request_token(request):
+    """Ключ из заголовка Authorization: Bearer <ключ> (или Token)."""
+    keyword, _, key = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if keyword.lower() in TOKEN_KEYWORDS:
+        return key.strip()
+    return None
+
+
+def find_token(key):
+    # Токен ищется на основной базе: только что выданный ключ
+    # на реплику ещё не попал.
+    return (Token.objects.using(router.db_for_write(Token))
+            .select_related('user')
+            .filter(digest=digest(key), user__is_active=True).first())
+
+
+def token_auth(view):
+    """Пользователь по токену API вместо сессии.
+
+    Запросы с токеном не проверяют CSRF: браузер не подставляет
+    заголовок Authorization сам. Запросы по сессии проверяются как
+    раньше.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request_token(request)
+        if key is None:
+            rejected = CsrfViewMiddleware().process_view(
+                request, view, args, kwargs)
+            if rejected is not None:
+                return error(403, 'Ошибка проверки CSRF')
+            return view(request, *args, **kwargs)
+        token = find_token(key)
+        if token is None:
+            return error(401, 'Недействительный токен')
+        request.user = token.user
+        return view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def login_required_json(view):
+    """Изменяющие запросы анонимов получают 401 в JSON."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated and request.method not in (
+                'GET', 'HEAD'):
+            return error(401, 'Требуется авторизация')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise ValueError('Тело запроса должно быть объектом JSON')
+        return data
+    if request.method == 'POST':
+        return request.POST.dict()
+    return QueryDict(request.body).dict()
+
+
+def serialize(request, resource, queryset, keys=()):
+    """Сериализатор для ?fields= и строки queryset под него."""
+    fields = parse_fields(resource, request.GET.get('fields'))
+    serializer = compile_serializer(resource, fields, keys)
+    return serializer, serializer.rows(queryset)
+
+
+def cursor_list(request, resource, queryset, keys, descending=True):
+    try:
+        serializer, rows = serialize(request, resource, queryset, keys)
+        page = RowCursorPaginator(
+            rows, settings.API_PAGE_SIZE, keys, descending,
+        ).page(request.GET.get('cursor'))
+    except (ValueError, InvalidCursor) as exception:
+        return error(400, str(exception))
+    return JsonResponse({
+        'results': list(map(serializer, page)),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def item(request, resource, queryset, status=200):
+    try:
+        serializer, rows = serialize(request, resource, queryset)
+    except ValueError as exception:
+        return error(400, str(exception))
+    row = rows.first()
+    if row is None:
+        return error(404, 'Не найдено')
+    return JsonResponse(serializer(row), status=status)
+
+
+def find_group(value):
+    """Группа по slug или id. Slug тоже может состоять из цифр,
+    поэтому совпадение по нему важнее."""
+    value = str(value)
+    lookup = Q(slug=value)
+    if value.isdigit():
+        lookup |= Q(pk=int(value))
+    found = {group.slug: group for group in Group.objects.filter(lookup)}
+    return found.get(value) or next(iter(found.values()), None)
+
+
+def save_post(request, instance=None):
+    """Создаёт или меняет пост через PostForm; группа задаётся slug
+    или id."""
+    try:
+        data = request_data(request)
+    except ValueError as exception:
+        return error(400, str(exception))
+    if instance is not None:
+        data = {'text': instance.text, 'group': instance.group_id, **data}
+    group = data.get('group')
+    if group and (isinstance(group, bool) or not isinstance(group, int)):
+        group = find_group(group)
+        if group is None:
+            return error(400, {'group': ['Нет такой группы']})
+        data['group'] = group.pk
+    form = PostForm(data, files=request.FILES or None, instance=instance)
+    if not form.is_valid():
+        return error(400, form.errors)
+    post = form.save(commit=False)
+    if instance is None:
+        post.author = request.user
+    post.save()
+    if 'image' in form.changed_data:
+        thumbnails.schedule(post)
+    return item(request, 'posts', Post.objects.filter(pk=post.pk),
+                status=201 if instance is None else 200)
+
+
+@read_from_replica
+@query_budget(12)
+@require_http_methods(['GET', 'POST'])
+@token_auth
+@login_required_json
+@rate_limit('post', methods=('POST',), rejected=too_many_requests)
+def posts(request):
+    if request.method == 'POST':
+        return save_post(request)
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        group = find_group(request.GET['group'])
+        queryset = (queryset.filter(group=group) if group is not None
+                    else queryset.none())
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return cursor_list(request, 'posts', queryset, ('pub_date', 'id'))
+
+
+@read_from_replica
+@query_budget(13)
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+@token_auth
+@login_required_json
+def post(request, post_id):
+    if request.method == 'GET':
+        return item(request, 'posts', Post.objects.filter(pk=post_id))
+    instance = get_object_or_404(Post, pk=post_id)
+    if instance.author_id != request.user.id:
+        return error(403, 'Менять пост может только автор')
+    if request.method == 'DELETE':
+        instance.delete()
+        return HttpResponse(status=204)
+    return save_post(request, instance)
+
+
+@read_from_replica
+@query_budget(6)
+@require_http_methods(['GET', 'POST'])
+@token_auth
+@login_required_json
+@rate_limit('comment', rejected=too_many_requests)
+def comments(request, post_id):
+    instance = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'GET':
+        return cursor_list(request, 'comments', instance.comments.all(),
+                           ('created', 'id'), descending=False)
+    try:
+        form = CommentForm(request_data(request))
+    except ValueError as exception:
+        return error(400, str(exception))
+    if not form.is_valid():
+        return error(400, form.errors)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = instance
+    comment.save()
+    return item(request, 'comments',
+                instance.comments.filter(pk=comment.pk), status=201)
+
+
+@read_from_replica
+@query_budget(3)
+@require_http_methods(['GET'])
+def groups(request):
+    try:
+        serializer, rows = serialize(
+            request, 'groups', Group.objects.order_by('title'))
+    except ValueError as exception:
+        return error(400, str(exception))
+    return JsonResponse({'results': list(map(serializer, rows))})
+
+
+@read_from_replica
+@query_budget(3)
+@require_http_methods(['GET'])
+def group(request, slug):
+    return item(request, 'groups', Group.objects.filter(slug=slug))
+
+
+@read_from_replica
+@query_budget(14)
+@require_http_methods(['GET', 'POST'])
+@token_auth
+@rate_limit('follow', rejected=too_many_requests)
+def follows(request):
+    """Подписки текущего пользователя; читать их может только он."""
+    if not request.user.is_authenticated:
+        return error(401, 'Требуется авторизация')
+    if request.method == 'GET':
+        try:
+            serializer, rows = serialize(
+                request, 'follows',
+                request.user.follower.order_by('author__username'))
+        except ValueError as exception:
+            return error(400, str(exception))
+        return JsonResponse({'results': list(map(serializer, rows))})
+    try:
+        username = request_data(request).get('author')
+    except ValueError as exception:
+        return error(400, str(exception))
+    author = User.objects.filter(username=username).first()
+    if author is None or author == request.user:
+        return error(400, {'author': ['Нельзя подписаться на этого автора']})
+    follow, created = Follow.objects.get_or_create(
+        user=request.user, author=author)
+    return item(request, 'follows', Follow.objects.filter(pk=follow.pk),
+                status=201 if created else 200)
+
+
+@query_budget(7)
+@require_http_methods(['DELETE'])
+@token_auth
+@login_required_json
+@rate_limit('follow', rejected=too_many_requests)
+def follow(request, username):
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author__username=username).delete()
+    if not deleted:
+        return error(404, 'Подписки нет')
+    return HttpResponse(status=204)
+
+
+@csrf_exempt
+@query_budget(6)
+@require_http_methods(['POST', 'DELETE'])
+@rate_limit('token', methods=('POST',), rejected=too_many_requests)
+def tokens(request):
+    """Выдаёт токен по имени и паролю; DELETE отзывает текущий.
+
+    Без CSRF: у клиента, который только получает токен, нет ни сессии,
+    ни cookie, а чужой сайт не прочитает ключ из ответа.
+    """
+    if request.method == 'DELETE':
+        key = request_token(request)
+        token = find_token(key) if key else None
+        if token is None:
+            return error(401, 'Требуется токен')
+        token.delete()
+        return HttpResponse(status=204)
+    try:
+        data = request_data(request)
+    except ValueError as exception:
+        return error(400, str(exception))
+    user = authenticate(request, username=data.get('username'),
+                        password=data.get('password'))
+    if user is None:
+        return error(400, 'Неверное имя пользователя или пароль')
+    key = Token.issue(user, name=str(data.get('name', ''))[:100])
+    return JsonResponse({'token': key}, status=201)
@@ -0,0 +1,129 @@
+"""Режим производительности для списков админки.
+
+PerformanceAdmin не считает полный COUNT(*) дважды
+(show_full_result_count), а для списка без фильтров берёт число строк
+из статистики планировщика: sqlite_stat1 после ANALYZE (иначе
+наибольший id) или pg_class.reltuples. Точный COUNT(*) остаётся для
+небольших таблиц и отфильтрованных списков, где он идёт по индексу.
+
+Поля из autocomplete_fields выводятся виджетом автодополнения. В
+list_editable стандартный виджет делает запрос на каждую строку,
+чтобы подписать выбранное значение; здесь подписи берутся из объектов
+list_select_related, уже загруженных вместе со списком.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max
+from django.forms.models import BaseModelFormSet
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using='default'):
+    """Приблизительное число строк таблицы модели или None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        row = None
+    if row and row[0] is not None:
+        return int(str(row[0]).split()[0])
+    if connection.vendor == 'sqlite':
+        return model._base_manager.using(using).aggregate(
+            top=Max('pk'))['top'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, не считающий COUNT(*) по большой таблице без фильтров.
+
+    Оценка больше settings.ADMIN_EXACT_COUNT_LIMIT заменяет точное
+    число; последние страницы при этом могут оказаться пустыми.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where and not query.distinct:
+            estimate = estimated_count(self.object_list.model,
+                                       self.object_list.db)
+            if (estimate is not None
+                    and estimate > settings.ADMIN_EXACT_COUNT_LIMIT):
+                return estimate
+        return super().count
+
+
+class LabelledAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, подписывающее выбранное значение из labels."""
+
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [item for item in value
+                    if str(item) not in self.choices.field.empty_values]
+        if self.labels is None or not all(
+                str(item) in self.labels for item in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for item in selected[:1]:
+            options.append(self.create_option(
+                name, item, self.labels[str(item)], True, len(options)))
+        return [(None, options, 0)]
+
+
+class LabelledFormSet(BaseModelFormSet):
+    """Формсет списка, передающий виджетам подписи связанных объектов."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.form.base_fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if not isinstance(widget, LabelledAutocompleteSelect):
+                continue
+            model_field = self.model._meta.get_field(name)
+            widget.labels = {
+                str(related.pk): field.label_from_instance(related)
+                for related in (
+                    getattr(instance, name)
+                    for instance in self.get_queryset()
+                    if model_field.is_cached(instance))
+                if related is not None
+            }
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    """Базовый ModelAdmin для таблиц, которые могут стать большими.
+
+    Наследники задают list_select_related и autocomplete_fields, чтобы
+    список не делал запрос на строку, а форма не выводила все строки
+    связанной таблицы в выпадающем списке.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', LabelledAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formset', LabelledFormSet)
+        return super().get_changelist_formset(request, **kwargs)
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .ratelimit import check_cache
+        checks.register(check_cache)
@@ -0,0 +1,217 @@
+"""ASGI-приложение для Django 2.2.
+
+В Django 2.2 нет ни ASGIHandler, ни async views (они появились в 3.0
+и 3.1), поэтому ASGIHandler переводит соединение ASGI 3 в WSGI-запрос
+сам. Тело запроса читается, а ответ отправляется в цикле событий;
+middleware, view и рендеринг шаблона выполняются целиком в
+ограниченном пуле потоков (ASGI_THREADS). Поток занят, только пока
+Django готовит ответ: ожидающие соединения, медленные клиенты и
+простаивающий keep-alive потоков не держат, а число одновременных
+запросов к базе не превышает размер пула.
+
+Запрос от начала до закрытия ответа обрабатывается в одном потоке,
+поэтому соединения с базой (они свои у каждого потока) закрываются
+сигналом request_finished там же, где открывались. Потоковый ответ
+передаётся в цикл событий частями через очередь ограниченного
+размера, так что медленный клиент притормаживает генератор, а не
+накапливает ответ в памяти.
+"""
+import asyncio
+import io
+import logging
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.urls import set_script_prefix
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 8
+
+
+def build_environ(scope, body):
+    """WSGI environ для HTTP scope ASGI и файла с телом запроса."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    root_path = scope.get('root_path', '')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'REMOTE_ADDR': str(client[0]),
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+def response_headers(response):
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+               for name, value in response.items()]
+    for cookie in response.cookies.values():
+        headers.append((b'set-cookie',
+                        cookie.output(header='').strip().encode('latin-1')))
+    return headers
+
+
+class ASGIHandler(base.BaseHandler):
+    """ASGI 3 приложение, обслуживающее Django из пула потоков."""
+
+    def __init__(self, threads, initializer=None):
+        super().__init__()
+        self.load_middleware()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi',
+            initializer=initializer)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Тип соединения {scope["type"]} '
+                             f'не поддерживается')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        worker = loop.run_in_executor(
+            self.executor, self.respond, build_environ(scope, body),
+            loop, queue)
+        connected = True
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            if connected:
+                try:
+                    await send(message)
+                except OSError:
+                    connected = False
+        await worker
+
+    async def read_body(self, receive):
+        """Тело запроса во временном файле или None, если клиент ушёл."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def respond(self, environ, loop, queue):
+        """Готовит ответ в потоке пула и передаёт его в очередь."""
+        def put(message):
+            asyncio.run_coroutine_threadsafe(
+                queue.put(message), loop).result()
+
+        response = None
+        try:
+            set_script_prefix(get_script_name(environ))
+            signals.request_started.send(
+                sender=self.__class__, environ=environ)
+            response = self.get_response(WSGIRequest(environ))
+            put({'type': 'http.response.start',
+                 'status': response.status_code,
+                 'headers': response_headers(response)})
+            chunks = response if response.streaming else [response.content]
+            for chunk in chunks:
+                put({'type': 'http.response.body', 'body': chunk,
+                     'more_body': True})
+            put({'type': 'http.response.body', 'body': b''})
+        except Exception:
+            logger.exception('Ошибка при отдаче ответа ASGI')
+            if response is None:
+                put({'type': 'http.response.start', 'status': 500,
+                     'headers': [(b'content-type', b'text/plain')]})
+                put({'type': 'http.response.body', 'body': b''})
+        finally:
+            if response is not None:
+                response.close()
+            environ['wsgi.input'].close()
+            put(None)
+
+
+def get_asgi_application(threads=None, initializer=None):
+    """Аналог get_wsgi_application() для ASGI-серверов."""
+    django.setup(set_prefix=False)
+    return ASGIHandler(threads or settings.ASGI_THREADS, initializer)
+
+
+def request_scope(method, path, query_string='', headers=()):
+    """HTTP scope для вызова приложения без сервера (бенчмарк, тесты)."""
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method.upper(),
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string.encode('latin-1'),
+        'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+async def call(application, scope, body=b''):
+    """Вызывает ASGI-приложение; возвращает (статус, заголовки, тело)."""
+    messages = [{'type': 'http.request', 'body': body}]
+    response = {'body': io.BytesIO()}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = message['headers']
+        else:
+            response['body'].write(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return (response['status'], response['headers'],
+            response['body'].getvalue())
@@ -0,0 +1,195 @@
+"""Настройки кэша из переменных окружения и двухуровневый кэш.
+
+CACHE_BACKEND выбирает общее для всех процессов хранилище: locmem (по
+умолчанию, только для разработки), file или memcached; CACHE_LOCATION
+задаёт каталог или адрес. С CACHE_TWO_TIER=1 перед общим хранилищем
+стоит TwoTierCache с небольшим LRU в памяти процесса.
+
+В LRU попадают только ключи с префиксами LOCAL_PREFIXES — фрагменты
+{% cache %}. Их ключи включают токен версии ленты, поэтому значение
+под ключом никогда не меняется: после инвалидации процессы просто
+начинают читать новый ключ, и согласовывать локальные копии не нужно.
+Изменяемые ключи (токены версий, счётчики) всегда читаются из общего
+хранилища.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+
+SHARED_ALIAS = 'shared'
+
+_missing = object()
+
+
+def cache_config(default_location, environ=os.environ):
+    """Словарь для CACHES."""
+    backend = environ.get('CACHE_BACKEND', 'locmem')
+    shared = {'BACKEND': BACKENDS.get(backend, backend)}
+    if backend != 'locmem':
+        shared['LOCATION'] = environ.get('CACHE_LOCATION', default_location)
+    if environ.get('CACHE_TWO_TIER') != '1':
+        return {'default': shared}
+    return {
+        'default': {
+            'BACKEND': 'core.cache.TwoTierCache',
+            'LOCATION': SHARED_ALIAS,
+            'OPTIONS': {
+                'LOCAL_SIZE': int(environ.get('CACHE_LOCAL_SIZE', 1000)),
+                'LOCAL_TIMEOUT': int(environ.get('CACHE_LOCAL_TIMEOUT', 300)),
+            },
+        },
+        SHARED_ALIAS: shared,
+    }
+
+
+class LocalLRU:
+    """Ограниченный по размеру LRU с истечением записей."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.entries.get(key, (_missing, 0))
+            if value is not _missing and expires > time.monotonic():
+                self.entries.move_to_end(key)
+                return value
+            self.entries.pop(key, None)
+            return _missing
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local_caches = {}
+_local_caches_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    """LRU процесса перед общим кэшем из CACHES[LOCATION]."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = location
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        self.local_prefixes = tuple(
+            options.get('LOCAL_PREFIXES', ('template.cache.',)))
+        with _local_caches_lock:
+            self.local = _local_caches.setdefault(
+                location, LocalLRU(options.get('LOCAL_SIZE', 1000)))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _is_local(self, key):
+        return key.startswith(self.local_prefixes)
+
+    def _local_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout - time.time(), self.local_timeout)
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self.shared.get(key, default, version)
+        local_key = self.make_key(key, version)
+        value = self.local.get(local_key)
+        if value is _missing:
+            value = self.shared.get(key, _missing, version)
+            if value is _missing:
+                return default
+            self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        if self._is_local(key):
+            self.local.set(self.make_key(key, version), value,
+                           self._local_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self._is_local(key):
+            self.local.delete(self.make_key(key, version))
+        return self.shared.add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        if self._is_local(key):
+            self.local.delete(self.make_key(key, version))
+        return self.shared.delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = (self.local.get(self.make_key(key, version))
+                     if self._is_local(key) else _missing)
+            if value is _missing:
+                remote.append(key)
+            else:
+                found[key] = value
+        for key, value in self.shared.get_many(remote, version).items():
+            if self._is_local(key):
+                self.local.set(self.make_key(key, version), value,
+                               self.local_timeout)
+            found[key] = value
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if self._is_local(key) and key not in failed:
+                self.local.set(self.make_key(key, version), value,
+                               self._local_timeout(timeout))
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            if self._is_local(key):
+                self.local.delete(self.make_key(key, version))
+        self.shared.delete_many(keys, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.shared.decr(key, delta, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
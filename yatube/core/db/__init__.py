@@ -0,0 +1,61 @@
+"""Настройки базы данных из переменных окружения.
+
+DB_ENGINE выбирает бэкенд: sqlite3 (по умолчанию), postgresql, mysql
+или полный путь к модулю. Для SQLite используется core.db.sqlite3 —
+бэкенд с прагмами (WAL, synchronous=NORMAL, mmap, busy_timeout),
+применяемыми при открытии соединения, и пулом соединений.
+DB_REPLICAS — список реплик через запятую: файлы для SQLite, хосты
+для остальных СУБД.
+"""
+import os
+
+ENGINES = {
+    'sqlite3': 'core.db.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+}
+
+
+def database_config(default_name, environ=os.environ):
+    """Словарь для DATABASES['default']."""
+    engine = environ.get('DB_ENGINE', 'sqlite3')
+    config = {
+        'ENGINE': ENGINES.get(engine, engine),
+        'NAME': environ.get('DB_NAME', default_name),
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', 60)),
+    }
+    if config['ENGINE'] != ENGINES['sqlite3']:
+        for key in ('USER', 'PASSWORD', 'HOST', 'PORT'):
+            config[key] = environ.get(f'DB_{key}', '')
+        return config
+    config['OPTIONS'] = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 4)),
+        'pragmas': {
+            name: environ.get(f'SQLITE_{name.upper()}', default)
+            for name, default in SQLITE_PRAGMAS.items()
+        },
+    }
+    return config
+
+
+def replica_configs(default, environ=os.environ):
+    """Словарь реплик для DATABASES: replica_1, replica_2, ...
+
+    В тестах реплики зеркалируют основную базу.
+    """
+    field = 'NAME' if default['ENGINE'] == ENGINES['sqlite3'] else 'HOST'
+    replicas = [value.strip() for value in
+                environ.get('DB_REPLICAS', '').split(',') if value.strip()]
+    return {
+        f'replica_{number}': {
+            **default, field: value, 'TEST': {'MIRROR': 'default'}}
+        for number, value in enumerate(replicas, start=1)
+    }
@@ -0,0 +1,85 @@
+"""Замер конкурентного чтения и записи в файл SQLite.
+
+Читатели выбирают страницу ленты, писатели вставляют строки короткими
+транзакциями, как post_create и add_comment. Сравнивает режимы
+журнала: в DELETE читатели ждут писателя, в WAL — нет.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DJANGO_DEFAULTS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def _connect(path, pragmas, timeout):
+    connection = sqlite3.connect(path, timeout=timeout,
+                                 isolation_level=None)
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def _prepare(path, pragmas, rows):
+    connection = _connect(path, pragmas, 5)
+    connection.execute(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+        'pub_date REAL)')
+    connection.execute('CREATE INDEX post_pub_date ON post (pub_date)')
+    connection.executemany(
+        'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+        ((f'Пост {index}', index) for index in range(rows)))
+    connection.close()
+
+
+def measure(pragmas, readers=4, writers=2, duration=2.0, timeout=0.1,
+            rows=5000):
+    """Число чтений и записей в секунду и число отказов «database is
+    locked» при заданных прагмах."""
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(path, write):
+        connection = _connect(path, pragmas, timeout)
+        done = locked = 0
+        while not stop.is_set():
+            try:
+                if write:
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.execute(
+                        'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                        ('Новый пост', time.time()))
+                    connection.execute('COMMIT')
+                else:
+                    connection.execute(
+                        'SELECT id, text FROM post '
+                        'ORDER BY pub_date DESC LIMIT 10').fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                locked += 1
+        connection.close()
+        with lock:
+            counts['writes' if write else 'reads'] += done
+            counts['locked'] += locked
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'concurrency.sqlite3')
+        _prepare(path, pragmas, rows)
+        threads = [
+            threading.Thread(target=worker, args=(path, index < writers))
+            for index in range(readers + writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return {
+        'reads_per_second': round(counts['reads'] / duration),
+        'writes_per_second': round(counts['writes'] / duration),
+        'locked': counts['locked'],
+    }
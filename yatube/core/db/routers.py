@@ -0,0 +1,47 @@
+"""Чтение лент с реплик.
+
+Views, помеченные read_from_replica, на GET и HEAD читают с одной из
+DATABASE_REPLICAS. Остальные запросы и все записи идут в основную
+базу. После изменяющего запроса (любого метода, кроме GET/HEAD/OPTIONS,
+или view, помеченного writes_primary) пользователь получает cookie и
+REPLICA_PIN_SECONDS секунд читает из основной базы, поэтому видит
+свои изменения, даже если реплика отстаёт.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'db_primary'
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+def read_from_replica(view):
+    """Разрешает view читать с реплики."""
+    view.read_from_replica = True
+    return view
+
+
+def writes_primary(view):
+    """Помечает view, которое пишет в базу и на GET: после него
+    пользователь тоже закрепляется за основной базой."""
+    view.writes_primary = True
+    return view
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
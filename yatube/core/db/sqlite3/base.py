@@ -0,0 +1,92 @@
+"""SQLite с прагмами на каждом новом соединении и пулом соединений.
+
+OPTIONS['pragmas'] выполняются сразу после открытия соединения.
+OPTIONS['pool_size'] задаёт, сколько закрытых соединений держать
+открытыми для повторного использования: запрос в новом потоке
+получает готовое соединение с прогретым кэшем страниц и mmap вместо
+нового открытия файла. CONN_MAX_AGE по-прежнему держит соединение за
+потоком между запросами; пул подхватывает соединения, которые Django
+закрыл по истечении CONN_MAX_AGE или при завершении потока.
+"""
+import queue
+import re
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_VALUE = re.compile(r'-?\w+')
+
+
+class ConnectionPool:
+    def __init__(self, size):
+        self.connections = queue.LifoQueue(maxsize=size)
+
+    def get(self):
+        while True:
+            try:
+                connection = self.connections.get_nowait()
+            except queue.Empty:
+                return None
+            try:
+                connection.execute('SELECT 1')
+            except base.Database.Error:
+                continue
+            return connection
+
+    def put(self, connection):
+        """Возвращает соединение в пул; False, если пул полон."""
+        if connection.in_transaction:
+            connection.rollback()
+        try:
+            self.connections.put_nowait(connection)
+        except queue.Full:
+            return False
+        return True
+
+    def clear(self):
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        size = self.settings_dict['OPTIONS'].get('pool_size', 0)
+        if not size or self.is_in_memory_db():
+            return None
+        with self._pools_lock:
+            return self._pools.setdefault(
+                self.settings_dict['NAME'], ConnectionPool(size))
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pool_size', None)
+        kwargs.pop('pragmas', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        connection = pool and pool.get()
+        if connection is not None:
+            return connection
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            if not (PRAGMA_VALUE.fullmatch(name)
+                    and PRAGMA_VALUE.fullmatch(str(value))):
+                raise ImproperlyConfigured(
+                    f'Недопустимая прагма SQLite: {name} = {value}')
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or not pool.put(self.connection):
+            super()._close()
@@ -0,0 +1,150 @@
+"""Учёт SQL-запросов и времени рендеринга шаблонов на запрос.
+
+InstrumentationMiddleware заводит RequestStats на каждый запрос,
+QueryRecorder подключается через connection.execute_wrapper, а
+InstrumentedDjangoTemplates замеряет рендеринг шаблонов.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+current_stats = ContextVar('current_stats', default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+_aggregate = defaultdict(Counter)
+_aggregate_lock = threading.Lock()
+
+
+@contextmanager
+def untracked():
+    """Работа внутри запроса, которая не относится к нему самому и не
+    учитывается в его статистике и бюджете."""
+    token = current_stats.set(None)
+    try:
+        yield
+    finally:
+        current_stats.reset(token)
+
+
+def query_budget(limit):
+    """Объявляет допустимое число SQL-запросов для view."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def signature(sql):
+    """SQL без литералов: одинаковая сигнатура — признак N+1."""
+    return _IN_LISTS.sub('(?)', _LITERALS.sub('?', sql))
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.signatures = Counter()
+        self.view_name = None
+        self.budget = None
+        self.rate_limited = False
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.signatures.items()
+                if count > 1}
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+class QueryRecorder:
+    """execute_wrapper, считающий запросы текущего запроса."""
+
+    def __call__(self, execute, sql, params, many, context):
+        stats = current_stats.get()
+        if stats is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.db_time += time.perf_counter() - started
+            stats.queries += 1
+            stats.signatures[signature(sql)] += 1
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, замеряющий время рендеринга.
+
+    Время включает запросы, выполненные из шаблона.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+def record(stats):
+    """Добавляет статистику запроса в агрегаты по view."""
+    if stats.view_name is None:
+        return
+    with _aggregate_lock:
+        totals = _aggregate[stats.view_name]
+        totals['requests'] += 1
+        totals['queries'] += stats.queries
+        totals['db_ms'] += round(stats.db_time * 1000, 3)
+        totals['template_ms'] += round(stats.template_time * 1000, 3)
+        totals['total_ms'] += round(stats.total_time * 1000, 3)
+        totals['max_queries'] = max(totals['max_queries'], stats.queries)
+        totals['with_duplicates'] += bool(stats.duplicates)
+        totals['over_budget'] += stats.over_budget
+        totals['rate_limited'] += stats.rate_limited
+
+
+def aggregated():
+    with _aggregate_lock:
+        return {view: dict(totals) for view, totals in _aggregate.items()}
+
+
+def reset():
+    with _aggregate_lock:
+        _aggregate.clear()
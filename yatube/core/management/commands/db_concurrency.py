@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import SQLITE_PRAGMAS
+from core.db.concurrency import DJANGO_DEFAULTS, measure
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает конкурентное чтение и запись в SQLite с прагмами '
+            'Django по умолчанию и с настроенными.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        tuned = settings.DATABASES['default'].get('OPTIONS', {}).get(
+            'pragmas', SQLITE_PRAGMAS)
+        tuned = {name: value for name, value in tuned.items()
+                 if name != 'busy_timeout'}
+        for title, pragmas in (('по умолчанию', DJANGO_DEFAULTS),
+                               ('настроенные', tuned)):
+            result = measure(pragmas, options['readers'],
+                             options['writers'], options['duration'])
+            self.stdout.write(
+                f'Прагмы {title}: чтений/с {result["reads_per_second"]}, '
+                f'записей/с {result["writes_per_second"]}, '
+                f'отказов из-за блокировки {result["locked"]}')
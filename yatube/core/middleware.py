@@ -0,0 +1,77 @@
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .db.routers import PIN_COOKIE, read_alias
+from .instrumentation import (QueryRecorder, RequestStats, current_stats,
+                              record)
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentationMiddleware:
+    """Считает SQL-запросы и время запроса, отдаёт их в Server-Timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.recorder = QueryRecorder()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.recorder))
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        stats.finish()
+        record(stats)
+        if stats.over_budget:
+            logger.warning(
+                '%s: %s SQL-запросов при бюджете %s',
+                stats.view_name, stats.queries, stats.budget)
+        response['Server-Timing'] = stats.server_timing()
+        response.instrumentation = stats
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.view_name = request.resolver_match.view_name
+            stats.budget = getattr(view_func, 'query_budget', None)
+
+
+class ReplicaMiddleware:
+    """Направляет чтение помеченных views на реплику и закрепляет
+    за основной базой того, кто только что писал."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        writes = (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                  or getattr(request, 'writes_primary', False))
+        if writes and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.writes_primary = getattr(view_func, 'writes_primary', False)
+        if (settings.DATABASE_REPLICAS
+                and getattr(view_func, 'read_from_replica', False)
+                and request.method in ('GET', 'HEAD')
+                and PIN_COOKIE not in request.COOKIES):
+            read_alias.set(random.choice(settings.DATABASE_REPLICAS))
@@ -0,0 +1,116 @@
+"""Ограничение частоты записей: token bucket в общем кэше.
+
+Ведро задаётся в settings.RATE_LIMITS парой (ёмкость, период в
+секундах): за период ведро полностью наполняется, а после простоя
+позволяет сразу ёмкость запросов. Ключ ведра — пользователь, для
+анонимов — IP-адрес.
+
+Ведро хранится одним числом — теоретическим временем прибытия (TAT,
+алгоритм GCRA, эквивалентный token bucket) в миллисекундах. Каждый
+запрос сдвигает его cache.incr на интервал между токенами; если TAT
+ушёл дальше now + ёмкость * интервал, токенов нет — сдвиг
+откатывается, а ответ 429 сообщает в Retry-After, когда появится
+следующий токен.
+
+Списания не теряются, только если incr атомарен: у memcached — между
+всеми процессами, у locmem — внутри одного процесса. Бэкенд file
+наследует incr и add от BaseCache (чтение, затем запись), и
+одновременные запросы могут пройти все разом; об этом предупреждает
+проверка core.W001.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import BaseCache
+from django.shortcuts import render
+
+from .instrumentation import current_stats
+
+KEY_PREFIX = 'ratelimit'
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def is_atomic(backend):
+    """incr бэкенда кэша атомарен, а не унаследован от BaseCache."""
+    shared = getattr(backend, 'shared', None)
+    if shared is not None:
+        return is_atomic(shared)
+    return type(backend).incr is not BaseCache.incr
+
+
+def check_cache(app_configs=None, **kwargs):
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not any(settings.RATE_LIMITS.values()) or is_atomic(backend):
+        return []
+    return [checks.Warning(
+        f'{type(backend).__name__} не умеет атомарный incr: '
+        f'RATE_LIMITS будут пропускать одновременные запросы сверх лимита.',
+        hint='Используйте CACHE_BACKEND=memcached.',
+        id='core.W001')]
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR")}'
+
+
+def take(scope, key, capacity, period, now=None):
+    """Берёт токен; возвращает 0 или через сколько секунд повторить."""
+    interval = max(1, period * 1000 // capacity)
+    now = int((time.time() if now is None else now) * 1000)
+    cache_key = f'{KEY_PREFIX}:{scope}:{key}'
+    # Ключа нет — ведро полное. Дальше срок жизни ключа продлевается
+    # до момента, когда ведро снова наполнится.
+    if cache.add(cache_key, now + interval, period):
+        return 0
+    try:
+        arrival = cache.incr(cache_key, interval)
+    except ValueError:
+        cache.add(cache_key, now + interval, period)
+        return 0
+    if arrival <= now + interval:
+        # Ведро успело наполниться, пока ключ жил: отсчёт от now.
+        cache.set(cache_key, now + interval, period)
+        return 0
+    excess = arrival - now - capacity * interval
+    if excess > 0:
+        cache.decr(cache_key, interval)
+        return math.ceil(excess / 1000)
+    cache.touch(cache_key, math.ceil((arrival - now) / 1000))
+    return 0
+
+
+def rate_limit(scope, methods=UNSAFE_METHODS, rejected=None):
+    """Ограничивает запросы к view ведром settings.RATE_LIMITS[scope].
+
+    methods=None ограничивает запросы любым методом; rejected(request,
+    retry_after) строит ответ 429 вместо страницы core/429.html.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limit = settings.RATE_LIMITS.get(scope)
+            if limit and (methods is None or request.method in methods):
+                retry_after = take(scope, client_key(request), *limit)
+                if retry_after:
+                    stats = current_stats.get()
+                    if stats is not None:
+                        stats.rate_limited = True
+                    response = (rejected or too_many_requests)(
+                        request, retry_after)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def too_many_requests(request, retry_after):
+    return render(request, 'core/429.html',
+                  {'retry_after': retry_after}, status=429)
@@ -1,18 +1,147 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 
+from core.admin import PerformanceAdmin
+
+from . import moderation, search
+from .forms import PostForm
 from .models import Follow, Post, Group, Comment
 
 
+class GroupChoiceForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+        empty_label='без группы')
+
+
+class GroupActionForm(ActionForm, GroupChoiceForm):
+    """Выбор действия и группы для reassign_group."""
+
+
+class ModerationAdmin(PerformanceAdmin):
+    """Список со скрытыми записями и массовыми действиями в фоне.
+
+    Стандартное delete_selected загружает каждую строку и вызывает
+    сигналы по одной, поэтому заменено действиями из posts.moderation.
+    """
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('moderation/<str:job>/',
+                 self.admin_site.admin_view(self.moderation_progress),
+                 name='%s_%s_moderation' % info),
+        ] + super().get_urls()
+
+    def moderation_progress(self, request, job):
+        state = moderation.progress(job)
+        if state is None:
+            raise Http404
+        return JsonResponse(state)
+
+    def start_moderation(self, request, operation, queryset, **params):
+        job = moderation.start(operation, queryset, **params)
+        info = self.model._meta.app_label, self.model._meta.model_name
+        self.message_user(request, format_html(
+            'Запущена задача для {} строк: <a href="{}">ход выполнения</a>',
+            moderation.progress(job)['total'],
+            reverse('admin:%s_%s_moderation' % info, args=(job,))))
+
+
+def moderation_action(operation, description, permission):
+    def action(modeladmin, request, queryset):
+        modeladmin.start_moderation(request, operation, queryset)
+    action.__name__ = operation
+    action.short_description = description
+    action.allowed_permissions = (permission,)
+    return action
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ModerationAdmin):
 
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'hidden')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', 'hidden')
     list_editable = ('group',)
+    form = PostForm
+    fields = ('text', 'author', 'group', 'image')
+    autocomplete_fields = ('author', 'group')
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    action_form = GroupActionForm
+    actions = (
+        moderation_action('delete_posts', 'Удалить выбранные посты',
+                          'delete'),
+        moderation_action('hide_posts', 'Скрыть выбранные посты', 'change'),
+        moderation_action('show_posts', 'Показать выбранные посты',
+                          'change'),
+        'reassign_group',
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+    def reassign_group(self, request, queryset):
+        form = GroupChoiceForm(request.POST)
+        if not form.is_valid():
+            self.message_user(request, 'Нет такой группы', level='error')
+            return
+        group = form.cleaned_data['group']
+        self.start_moderation(request, 'reassign_group', queryset,
+                              group_id=group and group.pk)
+    reassign_group.short_description = 'Перенести выбранные посты в группу'
+    reassign_group.allowed_permissions = ('change',)
+
+
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+
+    list_display = ('pk', 'title', 'slug', 'post_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+@admin.register(Comment)
+class CommentAdmin(ModerationAdmin):
+
+    list_display = ('pk', 'text', 'created', 'author', 'post', 'hidden')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    list_filter = ('hidden',)
+    autocomplete_fields = ('author', 'post')
+    empty_value_display = '-пусто-'
+    actions = (
+        moderation_action('delete_comments', 'Удалить выбранные комментарии',
+                          'delete'),
+        moderation_action('hide_comments', 'Скрыть выбранные комментарии',
+                          'change'),
+        moderation_action('show_comments', 'Показать выбранные комментарии',
+                          'change'),
+    )
+
 
+@admin.register(Follow)
+class FollowAdmin(PerformanceAdmin):
 
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
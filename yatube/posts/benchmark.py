@@ -0,0 +1,314 @@
+"""Нагрузочный бенчмарк views постов.
+
+seed() наполняет базу воспроизводимым набором данных через mixer:
+пользователи, группы, посты с картинками, комментарии и подписки с
+убывающим числом подписчиков у авторов (от «звезды» до одиночек).
+run() прогоняет сценарии через тестовый клиент Django и собирает
+пропускную способность, p50/p99 задержки и число SQL-запросов из
+InstrumentationMiddleware. Команда manage.py benchmark делает это на
+временной тестовой базе и сохраняет результат в JSON.
+
+serve() сравнивает обслуживание через WSGI (пул синхронных воркеров)
+и через core.asgi (цикл событий и пул потоков) при заданном числе
+одновременных соединений и искусственно медленной базе: каждый
+SQL-запрос в потоках обслуживания ждёт db_delay секунд. Оба сервера
+получают одинаковое число потоков, а замер повторяется для каждого
+значения из threads: иначе разница показывала бы размер пула, а не
+способ обслуживания.
+"""
+import asyncio
+import io
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections as databases
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.asgi import ASGIHandler, build_environ, call, request_scope
+
+from .models import Comment, Follow, Group, Post, User
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail',
+         'follow_index', 'post_create', 'api_posts', 'api_posts_sparse')
+
+SERVING_VIEWS = ('index', 'group_posts', 'profile', 'post_detail',
+                 'follow_index')
+
+DEFAULT_DATASET = {
+    'users': 200,
+    'groups': 10,
+    'posts': 2000,
+    'comments': 5000,
+    'images': 0.3,
+    'max_followers': 150,
+    'seed': 42,
+}
+
+
+def _images(count, rng):
+    """Сохраняет count небольших разноцветных JPEG; возвращает имена."""
+    names = []
+    for index in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+        buffer.seek(0)
+        names.append(default_storage.save(
+            f'posts/benchmark_{index}.jpg', buffer))
+    return names
+
+
+def seed(users, groups, posts, comments, images, max_followers, seed):
+    """Наполняет базу; у автора номер i около max_followers / (i + 1)
+    подписчиков. Возвращает объекты, которые нужны сценариям."""
+    from faker import Faker
+    from mixer.backend.django import mixer
+
+    rng = random.Random(seed)
+    Faker.seed(seed)
+    people = mixer.cycle(users).blend(User)
+    communities = mixer.cycle(groups).blend(Group)
+    pictures = _images(min(20, posts), rng) if images else []
+    authors = people[:max(1, users // 4)]
+    published = mixer.cycle(posts).blend(
+        Post,
+        author=(rng.choice(authors) for _ in range(posts)),
+        group=(rng.choice(communities + [None]) for _ in range(posts)),
+        image=(rng.choice(pictures)
+               if pictures and rng.random() < images else ''
+               for _ in range(posts)),
+    )
+    mixer.cycle(comments).blend(
+        Comment,
+        post=(rng.choice(published) for _ in range(comments)),
+        author=(rng.choice(people) for _ in range(comments)),
+    )
+    for rank, author in enumerate(authors):
+        fan_out = min(max_followers // (rank + 1), users - 1)
+        candidates = [user for user in people if user != author]
+        for follower in rng.sample(candidates, fan_out):
+            Follow.objects.create(user=follower, author=author)
+    return {
+        'group': max(communities, key=lambda group: group.posts.count()),
+        'author': authors[0],
+        'post': max(published, key=lambda post: post.comments.count()),
+        'reader': max(people, key=lambda user: user.follower.count()),
+    }
+
+
+def scenarios(fixtures):
+    """Запросы сценариев: (метод, адрес, данные, залогиниться ли)."""
+    return {
+        'index': ('get', reverse('posts:index_path'), None, False),
+        'group_posts': ('get', reverse(
+            'posts:group_list', args=(fixtures['group'].slug,)),
+            None, False),
+        'profile': ('get', reverse(
+            'posts:profile', args=(fixtures['author'].username,)),
+            None, False),
+        'post_detail': ('get', reverse(
+            'posts:post_detail', args=(fixtures['post'].pk,)),
+            None, False),
+        'follow_index': ('get', reverse('posts:follow_index'), None, True),
+        'post_create': ('post', reverse('posts:post_create'),
+                        {'text': 'Пост из бенчмарка'}, True),
+        'api_posts': ('get', reverse('api:posts'), None, False),
+        'api_posts_sparse': ('get', reverse('api:posts'),
+                             {'fields': 'id,author,pub_date'}, False),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def measure(client, method, url, data, requests, warmup=3, cold=False):
+    """Выполняет запросы и возвращает сводку по задержкам и SQL."""
+    send = getattr(client, method)
+    for _ in range(warmup):
+        send(url, data)
+    timings = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        request_started = time.perf_counter()
+        response = send(url, data)
+        timings.append(time.perf_counter() - request_started)
+        queries.append(response.instrumentation.queries)
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'status': response.status_code,
+        'throughput_rps': round(requests / elapsed, 1),
+        'mean_ms': round(sum(timings) / requests * 1000, 2),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'queries_mean': round(sum(queries) / requests, 2),
+        'queries_max': max(queries),
+    }
+
+
+@override_settings(RATE_LIMITS={})
+def run(fixtures, views=VIEWS, requests=100, warmup=3, cold=False):
+    """Прогоняет сценарии без ограничения частоты записей."""
+    client = Client()
+    client.force_login(fixtures['reader'])
+    anonymous = Client()
+    results = {}
+    for name, (method, url, data, login) in scenarios(fixtures).items():
+        if name not in views:
+            continue
+        cache.clear()
+        results[name] = measure(login and client or anonymous, method,
+                                url, data, requests, warmup, cold)
+    return results
+
+
+def slow_database(delay):
+    """initializer потока: каждый SQL-запрос задерживается на delay."""
+    def execute(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def initializer():
+        for alias in databases:
+            databases[alias].execute_wrappers.append(execute)
+    return initializer
+
+
+def _wsgi_call(handler, scope):
+    status = []
+    result = handler(build_environ(scope, io.BytesIO()),
+                     lambda line, headers: status.append(int(line[:3])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return status[0]
+
+
+async def _load(send, scope, connections, requests):
+    """connections клиентов по очереди шлют всего requests запросов."""
+    timings = []
+    statuses = []
+    remaining = iter(range(requests))
+
+    async def client():
+        for _ in remaining:
+            started = time.perf_counter()
+            statuses.append(await send(scope))
+            timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'connections': connections,
+        'status': max(statuses),
+        'throughput_rps': round(requests / elapsed, 1),
+        'mean_ms': round(sum(timings) / requests * 1000, 2),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+    }
+
+
+@override_settings(RATE_LIMITS={})
+def serve(fixtures, views=SERVING_VIEWS, connections=32, requests=200,
+          threads=(4, 32), db_delay=0.005):
+    """Пропускная способность WSGI и ASGI при медленной базе.
+
+    Все запросы идут от залогиненного читателя: анонимам страницы
+    отдаются из кэша целиком, и база в замер не попала бы. Результаты —
+    под именами '<сценарий>:wsgi:<потоков>' и '<сценарий>:asgi:<потоков>'.
+    """
+    client = Client()
+    client.force_login(fixtures['reader'])
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session}'
+    initializer = slow_database(db_delay)
+    wsgi = WSGIHandler()
+    results = {}
+    for count in threads:
+        wsgi_pool = ThreadPoolExecutor(count, initializer=initializer)
+        asgi = ASGIHandler(count, initializer=initializer)
+
+        async def via_wsgi(scope, pool=wsgi_pool):
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, _wsgi_call, wsgi, scope)
+
+        async def via_asgi(scope, handler=asgi):
+            return (await call(handler, scope))[0]
+
+        try:
+            for name, (method, url, _, _) in scenarios(fixtures).items():
+                if name not in views:
+                    continue
+                scope = request_scope(method, url,
+                                      headers=[('cookie', cookie)])
+                for mode, send in (('wsgi', via_wsgi), ('asgi', via_asgi)):
+                    result = asyncio.run(
+                        _load(send, scope, connections, requests))
+                    result['threads'] = count
+                    results[f'{name}:{mode}:{count}'] = result
+        finally:
+            wsgi_pool.shutdown()
+            asgi.executor.shutdown()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, dataset, **options):
+    """Результаты вместе с окружением для сравнения между коммитами."""
+    return {
+        'commit': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'dataset': dataset,
+        'options': options,
+        'views': results,
+    }
+
+
+def compare(baseline, results):
+    """Изменения метрик относительно прошлого прогона, в процентах."""
+    changes = {}
+    for name, current in results.items():
+        previous = baseline.get('views', {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - previous[metric])
+                          / previous[metric] * 100, 1)
+            for metric in ('throughput_rps', 'p50_ms', 'p99_ms',
+                           'queries_mean')
+            if previous.get(metric)
+        }
+    return changes
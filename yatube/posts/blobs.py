@@ -0,0 +1,162 @@
+"""Счётчики ссылок на картинки ContentAddressedStorage и сборка мусора.
+
+Сигналы Post вызывают retain() для новой картинки и release() для
+заменённой или удалённой, массовое удаление в модерации — release()
+для всей пачки. Когда на файл больше никто не ссылается, collect()
+после коммита удаляет его вместе с миниатюрами. Файл, который
+записывали или переиспользовали меньше MEDIA_GC_GRACE секунд назад,
+остаётся до следующей сборки: на него мог сослаться пост, который ещё
+сохраняется.
+
+Команда media_gc заводит записи для файлов без них (например, после
+отката транзакции), пересчитывает счётчики по постам, удаляет всё, на
+что никто не ссылается, и показывает экономию от дедупликации.
+"""
+import os
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BigIntegerField, Count, ExpressionWrapper, F,
+                              IntegerField, OuterRef, Subquery, Sum)
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+from .storage import is_blob
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def _size(name):
+    try:
+        return storage().size(name)
+    except OSError:
+        return 0
+
+
+def _mtime(name):
+    try:
+        return os.path.getmtime(storage().path(name))
+    except OSError:
+        return 0
+
+
+def retain(name):
+    """Добавляет ссылку на файл."""
+    if not is_blob(name):
+        return
+    blob, created = ImageBlob.objects.get_or_create(
+        name=name, defaults={'size': _size(name), 'refcount': 1})
+    if not created:
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + 1)
+
+
+def release(*names):
+    """Убирает ссылки на файлы; осиротевшие удаляются после коммита."""
+    names = Counter(name for name in names if is_blob(name))
+    for name, total in names.items():
+        ImageBlob.objects.filter(name=name).update(
+            refcount=F('refcount') - total)
+    if names:
+        transaction.on_commit(lambda: collect(list(names)))
+
+
+def _unlink(name, deadline):
+    """Удаляет файл, если его не переиспользовали после deadline.
+
+    Файл сначала атомарно переименовывается: загрузка дубликата после
+    этого его не найдёт и запишет заново, а загрузка, успевшая обновить
+    время изменения до переименования, видна по нему — тогда файл
+    возвращается на место.
+    """
+    path = storage().path(name)
+    tombstone = f'{path}.{uuid.uuid4().hex}.gc'
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return True
+    if os.path.getmtime(tombstone) > deadline:
+        os.replace(tombstone, path)
+        return False
+    os.remove(tombstone)
+    return True
+
+
+def collect(names=None):
+    """Удаляет файлы без ссылок старше MEDIA_GC_GRACE; возвращает имена.
+
+    Счётчик перечитывается под select_for_update в той же транзакции,
+    что удаляет запись, так что retain() не может проскочить между
+    проверкой и удалением.
+    """
+    orphans = ImageBlob.objects.filter(refcount__lte=0)
+    if names is not None:
+        orphans = orphans.filter(name__in=names)
+    deadline = time.time() - settings.MEDIA_GC_GRACE
+    collected = []
+    for pk, name in orphans.values_list('pk', 'name'):
+        with transaction.atomic():
+            blob = (ImageBlob.objects.select_for_update()
+                    .filter(pk=pk, refcount__lte=0).first())
+            if (blob is None or _mtime(name) > deadline
+                    or not _unlink(name, deadline)):
+                continue
+            blob.delete()
+        default.kvstore.delete(ImageFile(name, storage()))
+        collected.append(name)
+    return collected
+
+
+def register():
+    """Заводит записи для файлов хранилища без них и удаляет
+    оставшиеся после сбоя временные файлы; возвращает число новых
+    записей."""
+    root = storage().path(Post._meta.get_field('image').upload_to)
+    deadline = time.time() - settings.MEDIA_GC_GRACE
+    found = []
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            name = os.path.relpath(path, storage().location)
+            if is_blob(name):
+                found.append(ImageBlob(name=name, size=_size(name)))
+            elif (file_name.endswith(('.part', '.gc'))
+                  and _mtime(name) < deadline):
+                os.remove(path)
+    before = ImageBlob.objects.count()
+    ImageBlob.objects.bulk_create(found, batch_size=500,
+                                  ignore_conflicts=True)
+    return ImageBlob.objects.count() - before
+
+
+def reconcile():
+    """Пересчитывает ссылки по постам; возвращает число исправленных."""
+    actual = Coalesce(
+        Subquery(Post.all_objects.filter(image=OuterRef('name'))
+                 .order_by().values('image')
+                 .annotate(total=Count('pk')).values('total'),
+                 output_field=IntegerField()),
+        0)
+    drifted = (ImageBlob.objects.annotate(actual=actual)
+               .exclude(refcount=F('actual')))
+    return ImageBlob.objects.filter(
+        pk__in=drifted.values('pk')).update(refcount=actual)
+
+
+def savings():
+    """Файлы, ссылки и байты с дедупликацией и без неё."""
+    stats = ImageBlob.objects.filter(refcount__gt=0).aggregate(
+        files=Count('pk'),
+        references=Coalesce(Sum('refcount'), 0),
+        stored=Coalesce(Sum('size'), 0),
+        logical=Coalesce(Sum(ExpressionWrapper(
+            F('size') * F('refcount'), output_field=BigIntegerField())), 0))
+    stats['saved'] = stats['logical'] - stats['stored']
+    return stats
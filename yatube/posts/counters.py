@@ -0,0 +1,96 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Сигналы сдвигают счётчики атомарными UPDATE с F(), а reconcile()
+пересчитывает их одним UPDATE на таблицу после рассинхронизации.
+Уменьшение не опускает счётчик ниже нуля: разошедшийся счётчик иначе
+нарушил бы CHECK положительного поля и сорвал удаление. Скрытые
+модератором посты и комментарии не считаются. Заодно reconcile()
+сбрасывает закэшированные числа постов пагинатора.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, Profile, User
+from .paginators import reset_counts
+
+
+def _shift(**deltas):
+    return {field: F(field) + delta if delta >= 0
+            else Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()}
+
+
+def bump(model, pk, **deltas):
+    if pk is not None:
+        model._base_manager.filter(pk=pk).update(**_shift(**deltas))
+
+
+def bump_profile(user_id, **deltas):
+    """Сдвигает счётчики профиля, создавая его при первом росте."""
+    updated = Profile.objects.filter(user_id=user_id).update(
+        **_shift(**deltas))
+    if not updated and min(deltas.values()) > 0:
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id)], ignore_conflicts=True)
+        Profile.objects.filter(user_id=user_id).update(
+            **actual_counts(Profile))
+
+
+def _count(queryset, key, outer='pk'):
+    return Coalesce(
+        Subquery(queryset.filter(**{key: OuterRef(outer)})
+                 .order_by().values(key)
+                 .annotate(total=Count('pk')).values('total'),
+                 output_field=IntegerField()),
+        0)
+
+
+def actual_counts(model):
+    """Выражения с настоящими значениями счётчиков модели."""
+    if model is Profile:
+        return {
+            'post_count': _count(Post.objects, 'author', 'user'),
+            'follower_count': _count(Follow.objects, 'author', 'user'),
+            'following_count': _count(Follow.objects, 'user', 'user'),
+        }
+    if model is Group:
+        return {'post_count': _count(Post.objects, 'group')}
+    return {'comment_count': _count(Comment.objects, 'post')}
+
+
+def reconcile(dry_run=False):
+    """Пересчитывает счётчики; возвращает число расходившихся строк."""
+    if not dry_run:
+        Profile.objects.bulk_create(
+            (Profile(user_id=user_id) for user_id in
+             User.objects.filter(profile__isnull=True)
+             .values_list('pk', flat=True).iterator()),
+            batch_size=1000, ignore_conflicts=True)
+    drift = {}
+    for model in (Profile, Group, Post):
+        counts = actual_counts(model)
+        stale = Q()
+        for field in counts:
+            stale |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = (model._base_manager
+                   .annotate(**{f'actual_{field}': expression
+                                for field, expression in counts.items()})
+                   .filter(stale))
+        drift[model._meta.verbose_name_plural] = drifted.count()
+        if not dry_run:
+            model._base_manager.filter(
+                pk__in=drifted.values('pk')).update(**counts)
+    if not dry_run:
+        reset_counts(_post_counters())
+    return drift
+
+
+def _post_counters():
+    """Имена всех счётчиков постов пагинатора."""
+    yield 'index'
+    for group_id in Group.objects.values_list('pk', flat=True).iterator():
+        yield f'group:{group_id}'
+    authors = (Post._base_manager.order_by()
+               .values_list('author_id', flat=True).distinct())
+    for author_id in authors.iterator():
+        yield f'author:{author_id}'
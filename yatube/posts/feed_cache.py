@@ -0,0 +1,79 @@
+"""Версии закэшированных фрагментов лент.
+
+Каждая лента (главная, группа, профиль, подписки пользователя,
+комментарии поста) имеет токен версии в кэше. Токен входит в ключ
+{% cache %}, поэтому смена токена сигналом делает старые фрагменты
+недостижимыми и позволяет держать длинный TTL. В токене хранится
+время смены: пока она свежая, реплика могла её ещё не получить, и
+cache_token() даёт ключ, который перестанет читаться, когда окно
+отставания пройдёт.
+"""
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'feed-version'
+
+
+def _key(feed):
+    return f'{KEY_PREFIX}:{feed}'
+
+
+def _token():
+    return f'{uuid.uuid4().hex}.{int(time.time())}'
+
+
+def version(feed):
+    """Текущий токен версии ленты, создаётся при первом обращении."""
+    key = _key(feed)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, _token(), None)
+        token = cache.get(key)
+    return token
+
+
+def versions(feeds):
+    """Токены версий нескольких лент за одно обращение к кэшу."""
+    keys = {_key(feed): feed for feed in feeds}
+    tokens = cache.get_many(list(keys))
+    for key in keys.keys() - tokens.keys():
+        tokens[key] = version(keys[key])
+    return {keys[key]: token for key, token in tokens.items()}
+
+
+def combined(feeds):
+    """Один токен для набора лент: меняется при смене любой из них,
+    время берётся самое позднее."""
+    tokens = versions(feeds)
+    ordered = [tokens[feed] for feed in sorted(tokens)]
+    digest = hashlib.md5(''.join(ordered).encode()).hexdigest()
+    return f'{digest}.{max(map(bumped_at, ordered))}'
+
+
+def bump(*feeds):
+    """Инвалидирует фрагменты лент одним обращением к кэшу."""
+    if feeds:
+        cache.set_many({_key(feed): _token() for feed in feeds}, None)
+
+
+def bumped_at(token):
+    """Время смены токена (Unix time), 0 для токенов без времени."""
+    try:
+        return int(token.rpartition('.')[2])
+    except ValueError:
+        return 0
+
+
+def is_recent(token, seconds):
+    """Сменился ли токен за последние seconds секунд."""
+    return time.time() - bumped_at(token) < seconds
+
+
+def cache_token(token, seconds):
+    """Токен для ключей кэша. Если смена моложе seconds секунд, страница
+    могла быть собрана по отставшей реплике, поэтому ключ другой: через
+    seconds секунд её соберут заново, а не отдадут на весь TTL."""
+    return f'settling.{token}' if is_recent(token, seconds) else token
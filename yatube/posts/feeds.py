@@ -0,0 +1,153 @@
+"""Ленты Atom, RSS и JSON Feed для главной, групп и авторов.
+
+Ответ потоковый: заголовок ленты, записи по одной, окончание. Запись
+каждого поста сериализуется один раз и хранится в кэше под токеном
+версии поста, который сигналы меняют при правке и удалении. ETag и
+Last-Modified берутся из токена версии ленты, поэтому опрос без
+изменений получает 304 без выборки постов.
+"""
+import json
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import rfc2822_date
+
+from . import feed_cache
+from .page_cache import add_validators, validators
+
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+KEY_PREFIX = 'feed-entry'
+
+
+def _atom_entry(post, url):
+    category = (f'<category term={quoteattr(post.group.slug)} '
+                f'label={quoteattr(post.group.title)}/>'
+                if post.group else '')
+    return (
+        f'<entry><title>{escape(str(post))}</title>'
+        f'<link href={quoteattr(url)}/><id>{escape(url)}</id>'
+        f'<updated>{post.pub_date.isoformat()}</updated>'
+        f'<author><name>{escape(post.author.username)}</name></author>'
+        f'{category}<content type="text">{escape(post.text)}</content>'
+        f'</entry>'
+    )
+
+
+def _rss_entry(post, url):
+    category = (f'<category>{escape(post.group.title)}</category>'
+                if post.group else '')
+    return (
+        f'<item><title>{escape(str(post))}</title>'
+        f'<link>{escape(url)}</link>'
+        f'<guid isPermaLink="true">{escape(url)}</guid>'
+        f'<pubDate>{rfc2822_date(post.pub_date)}</pubDate>'
+        f'<dc:creator>{escape(post.author.username)}</dc:creator>'
+        f'{category}<description>{escape(post.text)}</description>'
+        f'</item>'
+    )
+
+
+def _json_entry(post, url):
+    item = {
+        'id': url,
+        'url': url,
+        'content_text': post.text,
+        'date_published': post.pub_date.isoformat(),
+        'authors': [{'name': post.author.username}],
+    }
+    if post.group:
+        item['tags'] = [post.group.title]
+    return json.dumps(item, ensure_ascii=False)
+
+
+ENTRIES = {'atom': _atom_entry, 'rss': _rss_entry, 'json': _json_entry}
+
+
+def _header(fmt, title, link, feed_url, updated):
+    if fmt == 'atom':
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(title)}</title>'
+            f'<link href={quoteattr(link)}/>'
+            f'<link rel="self" href={quoteattr(feed_url)}/>'
+            f'<id>{escape(feed_url)}</id>'
+            f'<updated>{updated.isoformat()}</updated>'
+        )
+    if fmt == 'rss':
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<rss version="2.0" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f'<title>{escape(title)}</title><link>{escape(link)}</link>'
+            f'<description>{escape(title)}</description>'
+            f'<lastBuildDate>{rfc2822_date(updated)}</lastBuildDate>'
+        )
+    return json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': title,
+        'home_page_url': link,
+        'feed_url': feed_url,
+    }, ensure_ascii=False)[:-1] + ', "items": ['
+
+
+FOOTERS = {'atom': '</feed>', 'rss': '</channel></rss>', 'json': ']}'}
+
+
+def _cache_token(version):
+    return feed_cache.cache_token(version, settings.REPLICA_PIN_SECONDS)
+
+
+def _stream(fmt, header, posts, request):
+    """Заголовок, записи (из кэша или свежие) и окончание ленты."""
+    yield header
+    base = request.build_absolute_uri('/')
+    versions = feed_cache.versions(f'post:{post.pk}' for post in posts)
+    keys = {post: f'{KEY_PREFIX}:{fmt}:{base}:{post.pk}:'
+                  f'{_cache_token(versions[f"post:{post.pk}"])}'
+            for post in posts}
+    cached = cache.get_many(list(keys.values()))
+    fresh = {}
+    for index, post in enumerate(posts):
+        entry = cached.get(keys[post])
+        if entry is None:
+            url = request.build_absolute_uri(
+                reverse('posts:post_detail', args=(post.pk,)))
+            entry = fresh[keys[post]] = ENTRIES[fmt](post, url)
+        yield (',' if fmt == 'json' and index else '') + entry
+    if fresh:
+        cache.set_many(fresh, settings.FEED_ENTRY_TIMEOUT)
+    yield FOOTERS[fmt]
+
+
+def feed_response(request, fmt, feed, title, link, queryset):
+    """Потоковый ответ с последними постами queryset для ленты feed."""
+    if fmt not in CONTENT_TYPES:
+        raise Http404
+    version = _cache_token(feed_cache.version(feed))
+    etag, last_modified = validators(request, [version])
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return add_validators(response, etag, last_modified)
+    posts = list(queryset.select_related('author', 'group')
+                 .order_by('-pub_date', '-id')[:settings.FEED_ITEMS])
+    link = request.build_absolute_uri(link)
+    updated = (posts[0].pub_date if posts
+               else datetime.fromtimestamp(0, timezone.utc))
+    header = _header(fmt, title, link, request.build_absolute_uri(),
+                     updated)
+    response = StreamingHttpResponse(
+        _stream(fmt, header, posts, request),
+        content_type=CONTENT_TYPES[fmt])
+    return add_validators(response, etag, last_modified)
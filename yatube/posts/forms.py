@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from posts import images
 from posts.models import Post, Comment
 
 
@@ -8,6 +10,15 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            (image, self.instance.image_width,
+             self.instance.image_height) = images.process(image)
+        elif not image:
+            self.instance.image_width = self.instance.image_height = None
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,137 @@
+"""Обработка картинок постов при загрузке.
+
+PostForm пропускает через process() каждую новую картинку до
+сохранения. Размеры проверяются по заголовку файла, без декодирования.
+Оригиналы больше POST_IMAGE_MAX_SIDE уменьшаются; JPEG при этом
+декодируется сразу в уменьшенном масштабе (Image.draft). Поворот из
+EXIF применяется к пикселям, а все метаданные, кроме цветового профиля
+и прозрачности, отбрасываются: картинка сохраняется с пустым info.
+Фотографии в JPEG перекодируются в POST_IMAGE_FORMAT: прогрессивный
+JPEG или WebP. PNG, GIF и картинки с палитрой или прозрачностью
+остаются в своём формате без потерь (или становятся WebP без потерь).
+Анимированные картинки сохраняются как есть, вместе с метаданными.
+
+Результат пишется во временный файл, который держится в памяти, только
+пока он меньше FILE_UPLOAD_MAX_MEMORY_SIZE, — так же, как сама загрузка.
+Миниатюры sorl потом строятся из картинки в несколько мегапикселей, а
+не из многомегабайтного оригинала.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png', 'GIF': 'gif'}
+# Ключи info, которые описывают само кодирование, а не содержат
+# метаданные; всё остальное (EXIF, XMP, текст PNG, комментарии)
+# требует перекодирования.
+FORMAT_INFO = frozenset((
+    'adobe', 'adobe_transform', 'aspect', 'background', 'chromaticity',
+    'dpi', 'gamma', 'icc_profile', 'interlace', 'jfif', 'jfif_density',
+    'jfif_unit', 'jfif_version', 'progression', 'progressive', 'srgb',
+    'transparency', 'version',
+))
+KEPT_INFO = ('icc_profile', 'transparency')
+ORIENTATION = 0x0112
+
+
+def _lossless(image):
+    return (image.format in ('PNG', 'GIF')
+            or image.mode in ('1', 'P', 'LA', 'PA', 'RGBA')
+            or 'transparency' in image.info)
+
+
+def has_metadata(image):
+    return not FORMAT_INFO.issuperset(image.info)
+
+
+def target_format(image):
+    """Формат, в котором картинка будет сохранена."""
+    if settings.POST_IMAGE_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP'
+    if _lossless(image):
+        return image.format if image.format in ('PNG', 'GIF') else 'PNG'
+    return 'JPEG'
+
+
+def _save_options(image, format_, lossless):
+    options = {'icc_profile': image.info.get('icc_profile')}
+    if format_ == 'JPEG':
+        options.update(quality=settings.POST_IMAGE_QUALITY, optimize=True,
+                       progressive=True)
+    elif format_ == 'WEBP':
+        options.update(quality=settings.POST_IMAGE_QUALITY,
+                       lossless=lossless, method=4)
+    elif format_ == 'PNG':
+        options['optimize'] = True
+    return {key: value for key, value in options.items()
+            if value is not None}
+
+
+def validate(upload, image):
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.', code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE >> 20})
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)d×%(height)d слишком большая.',
+            code='too_many_pixels', params={'width': width, 'height': height})
+
+
+def process(upload):
+    """Проверяет и уменьшает загруженную картинку.
+
+    Возвращает (файл, ширина, высота); файл — исходная загрузка, если
+    менять в ней нечего. Повреждённая картинка, которая выдала себя
+    только при декодировании, даёт ошибку формы, а не 500.
+    """
+    try:
+        return _process(upload)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Файл повреждён или не является изображением.',
+            code='invalid_image')
+
+
+def _process(upload):
+    upload.seek(0)
+    image = Image.open(upload)
+    validate(upload, image)
+    format_ = target_format(image)
+    lossless = _lossless(image)
+    side = settings.POST_IMAGE_MAX_SIDE
+    orientation = image.getexif().get(ORIENTATION, 1)
+    if getattr(image, 'is_animated', False) or (
+            format_ == image.format
+            and max(image.size) <= side and orientation == 1
+            and not has_metadata(image)
+            and (format_ != 'JPEG' or 'progressive' in image.info)):
+        width, height = image.size
+        upload.seek(0)
+        return upload, width, height
+
+    # Запас вдвое, как reducing_gap у thumbnail(): масштаб DCT не
+    # должен опускать картинку ниже удвоенного целевого размера.
+    image.draft(None, (side * 2, side * 2))
+    image.thumbnail((side, side))
+    if orientation != 1:
+        image = ImageOps.exif_transpose(image)
+    if format_ == 'JPEG' and image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    image.info = {key: image.info[key] for key in KEPT_INFO
+                  if key in image.info}
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    image.save(output, format_, **_save_options(image, format_, lossless))
+    size = output.tell()
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    width, height = image.size
+    return UploadedFile(
+        output, name=f'{stem}.{EXTENSIONS[format_]}',
+        content_type=Image.MIME[format_], size=size), width, height
@@ -0,0 +1,100 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность, задержки и число '
+            'SQL-запросов views постов на временной тестовой базе.')
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DEFAULT_DATASET.items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=type(default),
+                default=default, help=f'Набор данных: {name}.')
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Число замеряемых запросов на сценарий.')
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Число прогревочных запросов на сценарий.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--serving', action='store_true',
+            help='Сравнить WSGI и ASGI при одновременных соединениях и '
+                 'медленной базе вместо замера views через клиент.')
+        parser.add_argument(
+            '--connections', type=int, default=32,
+            help='Одновременных соединений для --serving.')
+        parser.add_argument(
+            '--threads', type=int, action='append',
+            help='Потоков у WSGI и у ASGI для --serving; можно указать '
+                 'несколько раз, по умолчанию 4 и 32.')
+        parser.add_argument(
+            '--db-delay', type=float, default=0.005,
+            help='Задержка каждого SQL-запроса в секундах для --serving.')
+        parser.add_argument(
+            '--view', action='append', choices=benchmark.VIEWS,
+            dest='views', help='Сценарий; можно указать несколько раз.')
+        parser.add_argument(
+            '--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Не удалось прочитать '
+                                   f'{options["compare"]}: {error}')
+        dataset = {name: options[name] for name in benchmark.DEFAULT_DATASET}
+        if options['serving']:
+            run, views = benchmark.serve, benchmark.SERVING_VIEWS
+            options['threads'] = tuple(options['threads'] or (4, 32))
+            option_names = ('requests', 'connections', 'threads', 'db_delay')
+        else:
+            run, views = benchmark.run, benchmark.VIEWS
+            option_names = ('requests', 'warmup', 'cold')
+        run_options = {name: options[name] for name in option_names}
+        views = options['views'] or views
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                    MEDIA_ROOT=media, THUMBNAIL_ASYNC=False):
+                fixtures = benchmark.seed(**dataset)
+                results = run(fixtures, views, **run_options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = benchmark.report(results, dataset, **run_options)
+        changes = benchmark.compare(baseline, results) if baseline else {}
+        for name, result in results.items():
+            line = (f'{name}: {result["throughput_rps"]} req/s, '
+                    f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс')
+            if 'queries_mean' in result:
+                line += f', SQL {result["queries_mean"]}'
+            self.stdout.write(line)
+            if name in changes:
+                self.stdout.write('  ' + ', '.join(
+                    f'{metric} {change:+}%'
+                    for metric, change in changes[name].items()))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты записаны в {options["output"]}'))
@@ -0,0 +1,64 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии или подписки '
+            'в JSON Lines или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument(
+            'path', nargs='?', help='Файл; по умолчанию stdout.')
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз; после каждой '
+                 'пачки печатается прогресс.')
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Пропустить столько строк и дописать файл.')
+
+    def progress(self, rows, file, kind, offset, every):
+        """Отдаёт строки дальше и после каждых every записанных
+        сообщает в stderr, с какой строки продолжить."""
+        started = time.monotonic()
+        self.done = offset
+        for row in rows:
+            yield row
+            self.done += 1
+            if (self.done - offset) % every == 0:
+                file.flush()
+                rate = (self.done - offset) / max(
+                    time.monotonic() - started, 1e-6)
+                self.stderr.write(
+                    f'{kind}: {self.done} строк ({rate:.0f} строк/с)')
+
+    def handle(self, *args, **options):
+        kind, path, offset = (
+            options['kind'], options['path'], options['offset'])
+        file_format = options['format'] or (
+            'csv' if path and path.endswith('.csv') else 'jsonl')
+        rows = bulk.export_rows(kind, offset, options['chunk_size'])
+        file = (sys.stdout if path is None else
+                open(path, 'a' if offset else 'w', encoding='utf-8',
+                     newline=''))
+        try:
+            bulk.write_rows(
+                file,
+                self.progress(rows, file, kind, offset,
+                              options['chunk_size']),
+                kind, file_format, header=not offset)
+        except (DatabaseError, OSError) as error:
+            raise CommandError(
+                f'Ошибка после {self.done} строк: {error!r}. '
+                f'Продолжить: --offset {self.done}')
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(f'{kind}: выгружено {self.done - offset}')
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок постов.'
+
+    def handle(self, *args, **options):
+        created = 0
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct())
+        for name in names.iterator():
+            if all(thumbnails.cached_thumbnail(name, geometry)
+                   for geometry in settings.POST_THUMBNAIL_SIZES):
+                continue
+            thumbnails.generate(name)
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы для {created} картинок'))
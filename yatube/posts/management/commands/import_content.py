@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии или подписки из JSON '
+            'Lines или CSV пачками bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одной транзакции.')
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Продолжить загрузку с этой строки.')
+        parser.add_argument(
+            '--skip-finalize', action='store_true',
+            help='Не пересчитывать счётчики, ленты и индекс: для '
+                 'нескольких загрузок подряд.')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        started = time.monotonic()
+        done = options['offset']
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = bulk.read_rows(file, file_format)
+            try:
+                for done in bulk.import_rows(
+                        kind, rows, options['batch_size'], done):
+                    rate = (done - options['offset']) / max(
+                        time.monotonic() - started, 1e-6)
+                    self.stdout.write(
+                        f'{kind}: {done} строк ({rate:.0f} строк/с)')
+            except (DatabaseError, KeyError, ValueError) as error:
+                raise CommandError(
+                    f'Ошибка после {done} строк: {error!r}. '
+                    f'Продолжить: --offset {done}')
+        if not options['skip_finalize']:
+            bulk.finalize()
+        self.stdout.write(self.style.SUCCESS(f'{kind}: загружено {done}'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+from posts.models import ImageBlob
+
+
+def megabytes(size):
+    return f'{size / 2 ** 20:.1f} МБ'
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает ссылки на картинки постов, удаляет файлы без '
+            'ссылок и показывает экономию от дедупликации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать статистику, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            orphans = ImageBlob.objects.filter(refcount__lte=0).count()
+            self.stdout.write(f'Файлов без ссылок: {orphans}')
+        else:
+            self.stdout.write(f'Новых файлов в учёте: {blobs.register()}')
+            self.stdout.write(f'Исправлено счётчиков: {blobs.reconcile()}')
+            self.stdout.write(f'Удалено файлов: {len(blobs.collect())}')
+        stats = blobs.savings()
+        self.stdout.write(
+            f'Файлов: {stats["files"]}, ссылок на них: '
+            f'{stats["references"]}')
+        share = (stats['saved'] / stats['logical'] * 100
+                 if stats['logical'] else 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Занято {megabytes(stats["stored"])} вместо '
+            f'{megabytes(stats["logical"])}, экономия '
+            f'{megabytes(stats["saved"])} ({share:.0f}%)'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число расходящихся строк.')
+
+    def handle(self, *args, **options):
+        drift = reconcile(dry_run=options['dry_run'])
+        for name, count in drift.items():
+            self.stdout.write(f'{name}: расхождений {count}')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import trim_all
+
+
+class Command(BaseCommand):
+    help = ('Обрезает ленты подписок до TIMELINE_SIZE записей. '
+            'Запускается периодически, например из cron.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Обработано лент: {trim_all()}')
+        self.stdout.write(self.style.SUCCESS('Ленты обрезаны'))
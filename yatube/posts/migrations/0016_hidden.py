@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['hidden', 'pub_date'], name='post_hidden_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='merged_on_read',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Подмешивается в ленты при чтении'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['merged_on_read', 'author', 'pub_date'], name='post_merged_author_idx'),
+        ),
+    ]
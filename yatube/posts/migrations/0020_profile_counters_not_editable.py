@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_merged_on_read'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписок'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+    ]
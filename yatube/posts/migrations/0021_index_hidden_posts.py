@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def index_hidden_posts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'INSERT OR REPLACE INTO posts_post_fts(rowid, text) '
+        'SELECT id, text FROM posts_post WHERE hidden')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_profile_counters_not_editable'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_hidden_posts, migrations.RunPython.noop),
+    ]
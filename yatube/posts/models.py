@@ -1,11 +1,44 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class VisibleManager(models.Manager):
+    """Менеджер по умолчанию: без скрытых модератором записей.
+
+    Через него же работают связанные менеджеры (author.posts,
+    post.comments), поэтому скрытое не попадает на страницы, в ленты и
+    в API. Админка и модерация используют all_objects.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(hidden=False)
+
+
+class CountersModel(models.Model):
+    """Модель с денормализованными счётчиками.
+
+    save() существующей строки не перезаписывает счётчики: их
+    сдвигают только атомарные UPDATE из posts.counters.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+
+class Group(CountersModel):
     title = models.CharField(
         max_length=200, verbose_name='Название',
         help_text='Укажите название группы'
@@ -19,12 +52,37 @@ class Group(models.Model):
         max_length=400, verbose_name='Описание',
         help_text='Укажите описание группы'
     )
+    post_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число постов')
+
+    counter_fields = ('post_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Profile(CountersModel):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name='profile')
+    post_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число постов')
+    follower_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число подписок')
+
+    counter_fields = ('post_count', 'follower_count', 'following_count')
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Post(CountersModel):
     LEN_POST: int = 15
 
     text = models.TextField(verbose_name='Текст',
@@ -54,17 +112,61 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name='Ширина картинки')
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name='Высота картинки')
+    comment_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число комментариев')
+    hidden = models.BooleanField(
+        default=False, editable=False, verbose_name='Скрыт')
+    merged_on_read = models.BooleanField(
+        default=False, editable=False,
+        verbose_name='Подмешивается в ленты при чтении')
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    counter_fields = ('comment_count',)
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['hidden', 'pub_date'],
+                         name='post_hidden_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['merged_on_read', 'author', 'pub_date'],
+                         name='post_merged_author_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:self.LEN_POST]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженные группу и картинку: сигналы сравнивают
+        их с новыми значениями без лишнего запроса перед save()."""
+        instance = super().from_db(db, field_names, values)
+        instance.remember_saved()
+        return instance
+
+    def remember_saved(self):
+        fields = self.__dict__
+        if 'group_id' in fields and 'image' in fields:
+            self._saved_group_id = self.group_id
+            self._saved_image = self.image.name or ''
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -88,6 +190,18 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
         help_text='Укажите дату публикации комментария')
+    hidden = models.BooleanField(
+        default=False, editable=False, verbose_name='Скрыт')
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -107,3 +221,37 @@ class Follow(models.Model):
                 name='nonunique_following_constraint'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class ImageBlob(models.Model):
+    """Файл ContentAddressedStorage и число постов, которые на него
+    ссылаются (включая скрытые)."""
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount'], name='imageblob_refcount_idx'),
+        ]
@@ -0,0 +1,242 @@
+"""Массовая модерация постов и комментариев из админки.
+
+Действие запускает задачу: строки выбираются пачками по возрастанию
+pk (keyset, без OFFSET), а каждая пачка — это несколько UPDATE или
+DELETE с pk__in в своей транзакции. Сигналы по строкам не вызываются,
+поэтому последствия считаются по пачке: счётчики сдвигаются одним
+UPDATE на автора, группу или пост, поисковый индекс и ленты в кэше
+обновляются одним запросом после коммита.
+
+Задачи выполняются в фоновом потоке по одной (MODERATION_WORKERS),
+чтобы не спорить за блокировку записи SQLite с посетителями; ход
+выполнения лежит в кэше и доступен через progress().
+"""
+import logging
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+
+from . import blobs, counters, feed_cache, search, timeline
+from .models import Comment, Group, Post, TimelineEntry
+from .paginators import adjust_counts
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'moderation'
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MODERATION_WORKERS,
+                thread_name_prefix='moderation')
+        return _executor
+
+
+def chunks(queryset, size):
+    """pk строк queryset пачками по size в порядке возрастания."""
+    last = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        pks = list(batch.values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _post_stats(queryset):
+    """(автор, группа, число) для видимых постов queryset."""
+    return list(queryset.filter(hidden=False).order_by()
+                .values_list('author_id', 'group_id')
+                .annotate(total=Count('pk')))
+
+
+def _shift_post_counters(stats, sign):
+    """Сдвигает счётчики в базе; возвращает сдвиги счётчиков в кэше."""
+    authors, groups = Counter(), Counter()
+    for author_id, group_id, total in stats:
+        authors[author_id] += total
+        if group_id is not None:
+            groups[group_id] += total
+    for author_id, total in authors.items():
+        counters.bump_profile(author_id, post_count=sign * total)
+    for group_id, total in groups.items():
+        counters.bump(Group, group_id, post_count=sign * total)
+    return {
+        'index': sign * sum(authors.values()),
+        **{f'author:{key}': sign * total for key, total in authors.items()},
+        **{f'group:{key}': sign * total for key, total in groups.items()},
+    }
+
+
+def _post_feeds(pks, stats, *extra_group_ids):
+    author_ids = {author_id for author_id, _, _ in stats}
+    group_ids = {group_id for _, group_id, _ in stats} | set(extra_group_ids)
+    return [
+        'index',
+        *(f'post:{pk}' for pk in pks),
+        *(f'profile:{author_id}' for author_id in author_ids),
+        *(f'group:{group_id}' for group_id in group_ids - {None}),
+        *timeline.follow_feeds(author_ids),
+    ]
+
+
+def _after_commit(deltas, feeds):
+    """Сдвигает счётчики в кэше и сбрасывает ленты после коммита."""
+    def invalidate():
+        for counter, delta in deltas.items():
+            if delta:
+                adjust_counts([counter], delta)
+        feed_cache.bump(*feeds)
+    transaction.on_commit(invalidate)
+
+
+def delete_posts(pks):
+    queryset = Post.all_objects.filter(pk__in=pks)
+    stats = _post_stats(queryset)
+    feeds = _post_feeds(pks, stats)
+    images = list(queryset.exclude(image='').values_list('image', flat=True))
+    Comment.all_objects.filter(post_id__in=pks)._raw_delete(queryset.db)
+    TimelineEntry.objects.filter(post_id__in=pks)._raw_delete(queryset.db)
+    queryset._raw_delete(queryset.db)
+    search.unindex_posts(pks)
+    blobs.release(*images)
+    _after_commit(_shift_post_counters(stats, -1), feeds)
+
+
+def hide_posts(pks):
+    queryset = Post.all_objects.filter(pk__in=pks, hidden=False)
+    stats = _post_stats(queryset)
+    feeds = _post_feeds(pks, stats)
+    queryset.update(hidden=True)
+    _after_commit(_shift_post_counters(stats, -1), feeds)
+
+
+def show_posts(pks):
+    queryset = Post.all_objects.filter(pk__in=pks, hidden=True)
+    shown = list(queryset.values_list('pk', flat=True))
+    queryset.update(hidden=False)
+    stats = _post_stats(Post.objects.filter(pk__in=shown))
+    _after_commit(_shift_post_counters(stats, 1), _post_feeds(shown, stats))
+
+
+def reassign_group(pks, group_id=None):
+    queryset = Post.all_objects.filter(pk__in=pks).exclude(
+        group_id=group_id)
+    moved = list(queryset.values_list('pk', flat=True))
+    stats = _post_stats(queryset)
+    feeds = _post_feeds(moved, stats, group_id)
+    queryset.update(group_id=group_id)
+    shifts = Counter()
+    for _, old_group_id, total in stats:
+        shifts[old_group_id] -= total
+        shifts[group_id] += total
+    deltas = {}
+    for shifted_id, delta in shifts.items():
+        if shifted_id is not None and delta:
+            counters.bump(Group, shifted_id, post_count=delta)
+            deltas[f'group:{shifted_id}'] = delta
+    _after_commit(deltas, feeds)
+
+
+def _comment_stats(queryset):
+    return list(queryset.filter(hidden=False).order_by()
+                .values_list('post_id')
+                .annotate(total=Count('pk')))
+
+
+def _shift_comment_counters(stats, sign):
+    for post_id, total in stats:
+        counters.bump(Post, post_id, comment_count=sign * total)
+    transaction.on_commit(lambda: feed_cache.bump(
+        *(f'post:{post_id}' for post_id, _ in stats)))
+
+
+def delete_comments(pks):
+    queryset = Comment.all_objects.filter(pk__in=pks)
+    stats = _comment_stats(queryset)
+    queryset._raw_delete(queryset.db)
+    _shift_comment_counters(stats, -1)
+
+
+def hide_comments(pks):
+    queryset = Comment.all_objects.filter(pk__in=pks, hidden=False)
+    stats = _comment_stats(queryset)
+    queryset.update(hidden=True)
+    _shift_comment_counters(stats, -1)
+
+
+def show_comments(pks):
+    queryset = Comment.all_objects.filter(pk__in=pks, hidden=True)
+    shown = list(queryset.values_list('pk', flat=True))
+    queryset.update(hidden=False)
+    _shift_comment_counters(
+        _comment_stats(Comment.objects.filter(pk__in=shown)), 1)
+
+
+OPERATIONS = {
+    'delete_posts': delete_posts,
+    'hide_posts': hide_posts,
+    'show_posts': show_posts,
+    'reassign_group': reassign_group,
+    'delete_comments': delete_comments,
+    'hide_comments': hide_comments,
+    'show_comments': show_comments,
+}
+
+
+def _key(job):
+    return f'{KEY_PREFIX}:{job}'
+
+
+def progress(job):
+    """Ход задачи: операция, всего, сделано и состояние, или None."""
+    return cache.get(_key(job))
+
+
+def run(job, operation, queryset, params):
+    state = progress(job)
+    try:
+        for pks in chunks(queryset, settings.MODERATION_BATCH_SIZE):
+            with transaction.atomic():
+                OPERATIONS[operation](pks, **params)
+            state['done'] += len(pks)
+            cache.set(_key(job), state, settings.MODERATION_PROGRESS_TIMEOUT)
+        state['state'] = 'done'
+    except Exception:
+        logger.exception('Задача модерации %s прервана', job)
+        state['state'] = 'failed'
+    finally:
+        cache.set(_key(job), state, settings.MODERATION_PROGRESS_TIMEOUT)
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def start(operation, queryset, **params):
+    """Запускает операцию над строками queryset; возвращает id задачи."""
+    job = uuid.uuid4().hex
+    cache.set(_key(job), {
+        'operation': operation,
+        'total': queryset.count(),
+        'done': 0,
+        'state': 'running',
+    }, settings.MODERATION_PROGRESS_TIMEOUT)
+    if settings.MODERATION_ASYNC:
+        _get_executor().submit(run, job, operation, queryset, params)
+    else:
+        run(job, operation, queryset, params)
+    return job
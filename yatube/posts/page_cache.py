@@ -0,0 +1,76 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страница кэшируется под ключом из адреса (с номером страницы) и
+токенов версий лент, которые она показывает. Сигналы меняют токены
+при изменении постов, комментариев, подписок и групп, так что старые
+страницы просто перестают читаться. ETag вычисляется из тех же
+токенов, Last-Modified — из времени их смены, поэтому на
+If-None-Match и If-Modified-Since ответ 304 отдаётся без шаблонов и
+почти без запросов к базе.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from . import feed_cache
+
+KEY_PREFIX = 'page'
+
+
+def _digest(request, versions):
+    data = '\n'.join([request.get_full_path(), *versions])
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def validators(request, versions):
+    """ETag и Last-Modified ответа по адресу и токенам версий лент."""
+    etag = quote_etag(_digest(request, versions))
+    return etag, max(map(feed_cache.bumped_at, versions))
+
+
+def add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def cache_anonymous_page(feeds):
+    """Кэширует ответы view для анонимов.
+
+    feeds(**kwargs) возвращает имена лент, из которых собрана
+    страница, или None, если страницы нет, — тогда работает сам view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            names = feeds(**kwargs)
+            if names is None:
+                return view(request, *args, **kwargs)
+            versions = [
+                feed_cache.cache_token(feed_cache.version(name),
+                                       settings.REPLICA_PIN_SECONDS)
+                for name in names]
+            etag, last_modified = validators(request, versions)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return add_validators(response, etag, last_modified)
+            key = f'{KEY_PREFIX}:{etag}'
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
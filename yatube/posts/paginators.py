@@ -0,0 +1,200 @@
+import base64
+import binascii
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import router
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+COUNT_KEY_PREFIX = 'post-count'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    """Упаковывает значения ключей в непрозрачный токен для ?cursor=."""
+    raw = '|'.join(
+        ['p' if backwards else 'n']
+        + [value.isoformat() if hasattr(value, 'isoformat') else str(value)
+           for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает ((дата, pk), backwards) из токена encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)).decode()
+        direction, created, pk = raw.split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Некорректный курсор')
+    if created is None or direction not in ('n', 'p'):
+        raise InvalidCursor('Некорректный курсор')
+    return (created, pk), direction == 'p'
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации.
+
+    Совместима с includes/paginator.html: вместо номеров страниц
+    отдаёт токены next_cursor/previous_cursor. Номер страницы без
+    COUNT(*) неизвестен, поэтому number всегда 1, а саму страницу
+    определяет cursor (пустой для первой).
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor='',
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page %s>' % (self.cursor or 'first')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (дата, pk) без COUNT(*) и OFFSET.
+
+    Стоимость страницы не зависит от её глубины, а порядок
+    не сдвигается при появлении новых записей. По умолчанию
+    новые записи идут первыми, descending=False — наоборот.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 descending=True):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.descending = descending
+        self.object_list = object_list.order_by(
+            *(f'-{key}' if descending else key for key in keys))
+
+    def _seek(self, values, backwards):
+        (date_key, pk_key), (date, pk) = self.keys, values
+        lookup = 'gt' if backwards == self.descending else 'lt'
+        return (
+            Q(**{f'{date_key}__{lookup}': date})
+            | Q(**{date_key: date, f'{pk_key}__{lookup}': pk}))
+
+    def _values(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def page(self, cursor):
+        backwards = False
+        queryset = self.object_list
+        if cursor:
+            values, backwards = decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(values, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            if not items:
+                return self.page(None)
+            items.reverse()
+        has_next = bool(items) and (backwards or has_more)
+        has_previous = bool(items) and bool(cursor) and (
+            has_more or not backwards)
+        return CursorPage(
+            items, self, cursor or '',
+            next_cursor=(encode_cursor(self._values(items[-1]))
+                         if has_next else None),
+            previous_cursor=(encode_cursor(self._values(items[0]), True)
+                             if has_previous else None),
+        )
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+
+def count_key(counter):
+    return f'{COUNT_KEY_PREFIX}:{counter}'
+
+
+def reset_counts(counters, batch_size=1000):
+    """Удаляет закэшированные счётчики; они пересчитаются при чтении."""
+    counters = iter(counters)
+    while True:
+        keys = [count_key(counter)
+                for counter in islice(counters, batch_size)]
+        if not keys:
+            return
+        cache.delete_many(keys)
+
+
+def adjust_counts(counters, delta):
+    """Сдвигает закэшированные счётчики; отсутствующие пересчитаются."""
+    for counter in counters:
+        try:
+            cache.incr(count_key(counter), delta)
+        except ValueError:
+            pass
+
+
+class CountedPage(Page):
+
+    @property
+    def page_range(self):
+        """Окно номеров вокруг текущей страницы для приблизительного
+        режима, иначе полный диапазон."""
+        if not self.paginator.approximate:
+            return self.paginator.page_range
+        half = settings.PAGINATOR_PAGE_RANGE // 2
+        first = max(1, min(self.number - half,
+                           self.paginator.num_pages
+                           - settings.PAGINATOR_PAGE_RANGE + 1))
+        last = min(self.paginator.num_pages,
+                   first + settings.PAGINATOR_PAGE_RANGE - 1)
+        return range(first, last + 1)
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор, берущий число постов из счётчика в кэше.
+
+    Счётчики ('index', 'group:<id>', 'author:<id>') поддерживаются
+    сигналами Post; при промахе кэша выполняется обычный COUNT(*) по
+    основной базе: сигналы сдвигают счётчик от её состояния, и
+    отставание реплики осталось бы в нём. Счётчик живёт
+    POST_COUNT_TIMEOUT секунд, так что накопившееся расхождение
+    исправляется само; recount_counters сбрасывает его сразу.
+    В приблизительном режиме шаблон выводит только окно номеров.
+    """
+
+    def __init__(self, object_list, per_page, counter, approximate=False):
+        super().__init__(object_list, per_page)
+        self.counter = counter
+        self.approximate = approximate
+
+    @cached_property
+    def count(self):
+        key = count_key(self.counter)
+        count = cache.get(key)
+        if count is None:
+            queryset = self.object_list
+            count = queryset.using(
+                router.db_for_write(queryset.model)).count()
+            cache.add(key, count, settings.POST_COUNT_TIMEOUT)
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        return CountedPage(*args, **kwargs)
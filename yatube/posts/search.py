@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite используется виртуальная таблица FTS5 posts_post_fts с
+rowid = id поста; сигналы Post держат её в актуальном состоянии.
+Скрытые посты остаются в индексе, чтобы модераторы находили их в
+админке; публичный поиск (SearchResults) их отсекает.
+На других СУБД поиск откатывается к text__icontains.
+"""
+import re
+
+from django.db import connections, router
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+VISIBLE = (f'INNER JOIN {Post._meta.db_table} post '
+           f'ON post.id = {TABLE}.rowid')
+_WORDS = re.compile(r'\w+')
+
+
+def _connection(write=False):
+    """Соединение, которое роутер выбрал бы для Post: в views с
+    read_from_replica поиск читает с той же реплики, что и посты."""
+    return connections[router.db_for_write(Post) if write
+                       else router.db_for_read(Post)]
+
+
+def available():
+    return _connection(write=True).vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5:
+    все слова обязательны, последнее ищется по префиксу."""
+    words = _WORDS.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post):
+    if not available():
+        return
+    with _connection(write=True).cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE}(rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text])
+
+
+def unindex_post(pk):
+    if not available():
+        return
+    with _connection(write=True).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [pk])
+
+
+def index_posts(pks):
+    """Индексирует (заново) посты с pk из списка одним запросом."""
+    if not available() or not pks:
+        return
+    with _connection(write=True).cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE}(rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} '
+            f'WHERE id IN ({", ".join(["%s"] * len(pks))})', pks)
+
+
+def unindex_posts(pks):
+    if not available() or not pks:
+        return
+    with _connection(write=True).cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} '
+            f'WHERE rowid IN ({", ".join(["%s"] * len(pks))})', pks)
+
+
+def rebuild():
+    """Перестраивает индекс целиком; возвращает число постов."""
+    with _connection(write=True).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'INSERT INTO {TABLE}(rowid, text) '
+                       f'SELECT id, text FROM {Post._meta.db_table}')
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def filter_posts(queryset, query):
+    """Сужает queryset до постов, найденных по запросу."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    if not available():
+        return queryset.filter(text__icontains=query)
+    # Не pk__in=RawSQL(...): Django 2.2 берёт подзапрос в двойные
+    # скобки, и SQLite возвращает из него только первую строку.
+    return queryset.extra(
+        where=[f'{Post._meta.db_table}.id IN '
+               f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'],
+        params=[expression])
+
+
+class SearchResults:
+    """Результаты поиска, упорядоченные по релевантности (bm25).
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    страница — один запрос к FTS5 и один к posts_post.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.expression = match_expression(query)
+        self.queryset = Post.objects.select_related('author', 'group')
+
+    def count(self):
+        if self.expression is None:
+            return 0
+        if not available():
+            return filter_posts(self.queryset, self.query).count()
+        with _connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {TABLE} {VISIBLE} '
+                f'WHERE {TABLE} MATCH %s AND NOT post.hidden',
+                [self.expression])
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, item):
+        if self.expression is None:
+            return []
+        if not available():
+            return list(filter_posts(self.queryset, self.query)[item])
+        with _connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT {TABLE}.rowid FROM {TABLE} {VISIBLE} '
+                f'WHERE {TABLE} MATCH %s AND NOT post.hidden '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, item.stop - item.start, item.start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,139 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, counters, feed_cache, search, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+from .paginators import adjust_counts
+
+
+@receiver(post_save, sender=User)
+def user_create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_load_saved(sender, instance, **kwargs):
+    """Состояние из базы обычно запомнено в Post.from_db; запрос нужен
+    только для постов, загруженных с отложенными полями."""
+    if instance._state.adding or hasattr(instance, '_saved_group_id'):
+        return
+    instance._saved_group_id, instance._saved_image = (
+        Post.all_objects.filter(pk=instance.pk)
+        .values_list('group_id', 'image').first()) or (None, '')
+
+
+def bump_post_feeds(post, follow_feeds=None, *extra_group_ids):
+    if follow_feeds is None:
+        follow_feeds = timeline.follow_feeds([post.author_id])
+    group_ids = {post.group_id, *extra_group_ids} - {None}
+    feed_cache.bump(
+        'index',
+        f'post:{post.pk}',
+        f'profile:{post.author_id}',
+        *(f'group:{group_id}' for group_id in group_ids),
+        *follow_feeds,
+    )
+
+
+def group_counters(group_id):
+    return [f'group:{group_id}'] if group_id is not None else []
+
+
+def post_counters(post):
+    return (['index', f'author:{post.author_id}']
+            + group_counters(post.group_id))
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    search.index_post(instance)
+    if instance.hidden:
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    follow_feeds = None
+    if created:
+        follow_feeds = timeline.fan_out(instance)
+        adjust_counts(post_counters(instance), 1)
+        counters.bump_profile(instance.author_id, post_count=1)
+        counters.bump(Group, instance.group_id, post_count=1)
+    elif saved_group_id != instance.group_id:
+        adjust_counts(group_counters(saved_group_id), -1)
+        adjust_counts(group_counters(instance.group_id), 1)
+        counters.bump(Group, saved_group_id, post_count=-1)
+        counters.bump(Group, instance.group_id, post_count=1)
+    bump_post_feeds(instance, follow_feeds, saved_group_id)
+
+
+@receiver(post_save, sender=Post)
+def post_image_refs(sender, instance, **kwargs):
+    saved_image = getattr(instance, '_saved_image', '')
+    if instance.image.name != saved_image:
+        blobs.retain(instance.image.name)
+        blobs.release(saved_image)
+
+
+@receiver(post_save, sender=Post)
+def post_remember_saved(sender, instance, **kwargs):
+    instance.remember_saved()
+
+
+@receiver(post_delete, sender=Post)
+def post_release_image(sender, instance, **kwargs):
+    blobs.release(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def post_invalidate(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+    if instance.hidden:
+        return
+    adjust_counts(post_counters(instance), -1)
+    counters.bump_profile(instance.author_id, post_count=-1)
+    counters.bump(Group, instance.group_id, post_count=-1)
+    bump_post_feeds(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and not instance.hidden:
+        counters.bump(Post, instance.post_id, comment_count=1)
+    feed_cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_invalidate(sender, instance, **kwargs):
+    if instance.hidden:
+        return
+    counters.bump(Post, instance.post_id, comment_count=-1)
+    feed_cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    feed_cache.bump(f'group:{instance.pk}')
+
+
+def bump_follow_feeds(follow):
+    feed_cache.bump(
+        f'follow:{follow.user_id}',
+        f'profile:{follow.user_id}',
+        f'profile:{follow.author_id}',
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_profile(instance.author_id, follower_count=1)
+        counters.bump_profile(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+    bump_follow_feeds(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_purge(sender, instance, **kwargs):
+    counters.bump_profile(instance.author_id, follower_count=-1)
+    counters.bump_profile(instance.user_id, following_count=-1)
+    timeline.purge(instance.user_id, instance.author_id)
+    bump_follow_feeds(instance)
@@ -0,0 +1,63 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 его содержимого:
+posts/ab/ab12…ef.jpg. Хеш считается за один проход по загрузке, после
+чего файл пишется обычным FileSystemStorage во временное имя и
+атомарно переименовывается. Если такой файл уже есть, новая копия не
+пишется: посты с одинаковыми картинками ссылаются на один файл, а
+значит, и на одни миниатюры sorl. У переиспользованного файла
+обновляется время изменения, чтобы сборщик мусора (posts.blobs) не
+удалил его, пока ссылающийся пост ещё сохраняется; если файл как раз
+убрали, он записывается заново.
+
+Старые файлы с обычными именами продолжают открываться как раньше.
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.\w+)?$')
+EXTENSIONS = {'.jpeg': '.jpg', '.jpe': '.jpg'}
+
+
+def is_blob(name):
+    """Имя создано ContentAddressedStorage."""
+    return bool(name) and BLOB_NAME.search(name) is not None
+
+
+def digest(content):
+    """SHA-256 содержимого файла."""
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, раскладывающий файлы по хешу содержимого."""
+
+    def blob_name(self, name, content_digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        extension = EXTENSIONS.get(extension, extension)
+        return os.path.join(directory, content_digest[:2],
+                            content_digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        name = self.blob_name(name, digest(content))
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
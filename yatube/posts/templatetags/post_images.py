@@ -0,0 +1,21 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_thumbnail(image, geometry):
+    """URL готовой миниатюры, а пока её нет — URL оригинала."""
+    if not image:
+        return ''
+    thumbnail = thumbnails.cached_thumbnail(image, geometry)
+    return thumbnail.url if thumbnail else image.url
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, geometry):
+    """Разрешает миниатюры всей страницы ленты одним пакетом."""
+    thumbnails.prefetch_thumbnails(posts, geometry)
+    return ''
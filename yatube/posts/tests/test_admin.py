@@ -0,0 +1,85 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import estimated_count
+from .. import moderation
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for index in range(count):
+            author = User.objects.create_user(
+                username=f'user{User.objects.count()}')
+            post = Post.objects.create(author=author, text=f'Пост {index}',
+                                       group=self.group)
+            Comment.objects.create(post=post, author=author, text='Ответ')
+            Follow.objects.create(user=author, author=self.admin)
+
+    def changelist_queries(self, model):
+        address = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(address).status_code, 200)
+        return len(context)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_rows(2)
+        before = {model: self.changelist_queries(model)
+                  for model in ('post', 'comment', 'follow')}
+        self.add_rows(5)
+        after = {model: self.changelist_queries(model)
+                 for model in ('post', 'comment', 'follow')}
+        self.assertEqual(before, after)
+
+    def test_autocomplete_instead_of_dropdown(self):
+        self.add_rows(1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(
+            response, f'<option value="{self.group.pk}" selected>Группа')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'pub_date__year': '1999'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_search_finds_every_match(self):
+        self.add_rows(3)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пост'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_search_finds_hidden_posts(self):
+        self.add_rows(3)
+        moderation.hide_posts([Post.objects.get(text='Пост 0').pk])
+        address = reverse('admin:posts_post_changelist')
+        response = self.client.get(address, {'q': 'пост'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(address,
+                                   {'q': 'пост 0', 'hidden__exact': 1})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Пост 0'])
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_estimated_count(self):
+        self.add_rows(3)
+        Post.objects.filter(text='Пост 0').delete()
+        self.assertEqual(estimated_count(Post), Post.objects.latest('pk').pk)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.context['cl'].result_count,
+                         estimated_count(Post))
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'),
+            {'pub_date__year': Post.objects.latest('pk').pub_date.year})
+        self.assertEqual(response.context['cl'].result_count, 2)
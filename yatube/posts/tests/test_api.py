@@ -0,0 +1,220 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from api.models import Token
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {index}',
+                                group=cls.group if index % 2 else None)
+            for index in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = self.client_class()
+        self.author_client.force_login(self.author)
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+
+    def send(self, client, method, address, data):
+        return getattr(client, method)(
+            address, json.dumps(data), content_type='application/json')
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_posts_cursor(self):
+        address = reverse('api:posts')
+        texts = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(address, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            texts += [post['text'] for post in response.json()['results']]
+            cursor = response.json()['next']
+        self.assertEqual(
+            texts, [f'Пост {index}' for index in range(4, -1, -1)])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,author'})
+        self.assertEqual(response.json()['results'][0],
+                         {'id': self.posts[-1].pk, 'author': 'author'})
+        response = self.client.get(reverse('api:posts'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api:posts'), {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api:posts'), {'fields': ','})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_detail_and_filters(self):
+        post = self.posts[1]
+        response = self.client.get(reverse('api:post', args=(post.pk,)))
+        self.assertEqual(response.json()['group'], 'group')
+        self.assertEqual(response.json()['author'], 'author')
+        self.assertEqual(
+            self.client.get(reverse('api:post', args=(0,))).status_code, 404)
+        for value in ('group', self.group.pk):
+            response = self.client.get(reverse('api:posts'), {'group': value})
+            self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(reverse('api:posts'), {'group': 'none'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_write_requires_login(self):
+        response = self.send(self.client, 'post', reverse('api:posts'),
+                             {'text': 'Аноним'})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Post.objects.filter(text='Аноним').exists())
+
+    def test_create_edit_delete(self):
+        response = self.send(self.author_client, 'post', reverse('api:posts'),
+                             {'text': 'Новый', 'group': 'group'})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual((post.author, post.group), (self.author, self.group))
+        address = reverse('api:post', args=(post.pk,))
+        response = self.send(self.reader_client, 'patch', address,
+                             {'text': 'Чужая правка'})
+        self.assertEqual(response.status_code, 403)
+        response = self.send(self.author_client, 'patch', address,
+                             {'text': 'Правка'})
+        self.assertEqual(response.json()['text'], 'Правка')
+        self.assertEqual(response.json()['group'], 'group')
+        response = self.send(self.author_client, 'post', reverse('api:posts'),
+                             {'text': 'Группа true', 'group': True})
+        self.assertIn('group', response.json()['errors'])
+        response = self.send(self.author_client, 'post', reverse('api:posts'),
+                             {'text': ''})
+        self.assertIn('text', response.json()['errors'])
+        self.assertEqual(self.author_client.delete(address).status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_comments(self):
+        address = reverse('api:comments', args=(self.posts[0].pk,))
+        response = self.send(self.author_client, 'post', address,
+                             {'text': 'Ответ'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [comment['text']
+             for comment in self.client.get(address).json()['results']],
+            ['Комментарий', 'Ответ'])
+
+    def test_groups(self):
+        response = self.client.get(reverse('api:groups'))
+        self.assertEqual(response.json()['results'][0]['slug'], 'group')
+        response = self.client.get(reverse('api:group', args=('group',)),
+                                   {'fields': 'post_count'})
+        self.assertEqual(response.json(), {'post_count': 2})
+
+    def test_follows(self):
+        address = reverse('api:follows')
+        self.assertEqual(self.client.get(address).status_code, 401)
+        response = self.send(self.reader_client, 'post', address,
+                             {'author': 'author'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(self.reader_client.get(address).json()['results'],
+                         [{'user': 'reader', 'author': 'author'}])
+        response = self.send(self.reader_client, 'post', address,
+                             {'author': 'reader'})
+        self.assertEqual(response.status_code, 400)
+        unfollow = reverse('api:follow', args=('author',))
+        self.assertEqual(self.reader_client.delete(unfollow).status_code, 204)
+        self.assertEqual(self.reader_client.delete(unfollow).status_code, 404)
+
+    def test_token_auth(self):
+        # Свой экземпляр: пароль cls.author пережил бы откат теста.
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('пароль')
+        author.save()
+        client = Client(enforce_csrf_checks=True)
+        response = self.send(client, 'post', reverse('api:tokens'),
+                             {'username': 'author', 'password': 'не тот'})
+        self.assertEqual(response.status_code, 400)
+        response = self.send(client, 'post', reverse('api:tokens'),
+                             {'username': 'author', 'password': 'пароль'})
+        self.assertEqual(response.status_code, 201)
+        key = response.json()['token']
+        self.assertFalse(Token.objects.filter(digest=key).exists())
+        response = client.post(
+            reverse('api:posts'),
+            json.dumps({'text': 'С телефона', 'group': self.group.pk}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {key}')
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(text='С телефона')
+        self.assertEqual((post.author, post.group), (self.author, self.group))
+        response = client.post(
+            reverse('api:posts'), json.dumps({'text': 'Чужой'}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer чужой')
+        self.assertEqual(response.status_code, 401)
+        response = client.delete(reverse('api:tokens'),
+                                 HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, 204)
+        response = client.delete(reverse('api:post', args=(post.pk,)),
+                                 HTTP_AUTHORIZATION=f'Bearer {key}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_session_writes_still_need_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = self.send(client, 'post', reverse('api:posts'),
+                             {'text': 'Без CSRF'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('detail', response.json())
+        self.assertFalse(Post.objects.filter(text='Без CSRF').exists())
+
+    def check_budget(self, response):
+        stats = response.instrumentation
+        with self.subTest(view=stats.view_name, method=response.request[
+                'REQUEST_METHOD']):
+            self.assertIsNotNone(stats.budget)
+            self.assertLessEqual(stats.queries, stats.budget)
+
+    def test_views_within_budget(self):
+        key = Token.issue(self.author)
+        bearer = Client(HTTP_AUTHORIZATION=f'Bearer {key}')
+        other = Group.objects.create(title='Другая', slug='other')
+        for client in (self.author_client, bearer):
+            responses = []
+            response = self.send(client, 'post', reverse('api:posts'),
+                                 {'text': 'Новый', 'group': 'group'})
+            responses.append(response)
+            address = reverse('api:post', args=(response.json()['id'],))
+            comments = reverse('api:comments', args=(self.posts[0].pk,))
+            responses += [
+                client.get(reverse('api:posts'), {'group': 'group'}),
+                client.get(address),
+                self.send(client, 'patch', address,
+                          {'text': 'Правка', 'group': other.slug}),
+                client.get(comments),
+                self.send(client, 'post', comments, {'text': 'Ответ'}),
+                client.get(reverse('api:groups')),
+                client.get(reverse('api:group', args=('group',))),
+                self.send(client, 'post', reverse('api:follows'),
+                          {'author': 'reader'}),
+                client.get(reverse('api:follows')),
+                client.delete(reverse('api:follow', args=('reader',))),
+                client.delete(address),
+            ]
+            for response in responses:
+                self.assertLess(response.status_code, 400)
+                self.check_budget(response)
+        self.check_budget(self.send(
+            self.client, 'post', reverse('api:tokens'),
+            {'username': 'author', 'password': 'нет'}))
+        self.check_budget(bearer.delete(reverse('api:tokens')))
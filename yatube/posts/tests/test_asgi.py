@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.asgi import ASGIHandler, call, request_scope
+
+from .. import benchmark
+from ..models import Post, User
+
+
+class ASGITests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author,
+                                        text='Пост через ASGI')
+        self.application = ASGIHandler(2)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def get(self, address, query_string='', headers=()):
+        return asyncio.run(call(self.application, request_scope(
+            'get', address, query_string, headers)))
+
+    def test_page(self):
+        status, headers, body = self.get(reverse('posts:index_path'))
+        self.assertEqual(status, 200)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'),
+                      headers)
+        self.assertIn('Пост через ASGI', body.decode())
+
+    def test_query_string_and_missing_page(self):
+        status, _, body = self.get(reverse('api:posts'), 'fields=id,text')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['results'],
+                         [{'id': self.post.pk, 'text': 'Пост через ASGI'}])
+        status, _, _ = self.get('/posts/0/')
+        self.assertEqual(status, 404)
+
+    def test_streaming_feed(self):
+        status, _, body = self.get(
+            reverse('posts:index_feed', args=('rss',)))
+        self.assertEqual(status, 200)
+        self.assertIn('Пост через ASGI', body.decode())
+
+    def test_session_cookie(self):
+        self.client.force_login(self.author)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        status, _, _ = self.get(
+            reverse('posts:follow_index'),
+            headers=[('cookie', f'{settings.SESSION_COOKIE_NAME}={session}')])
+        self.assertEqual(status, 200)
+        status, _, _ = self.get(reverse('posts:follow_index'))
+        self.assertEqual(status, 302)
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.shutdown'},
+                    {'type': 'lifespan.startup'}]
+        sent = []
+
+        async def receive():
+            return messages.pop()
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+@override_settings(THUMBNAIL_ASYNC=False)
+class ServeBenchmarkTests(TransactionTestCase):
+
+    def test_serve_reports_both_modes(self):
+        fixtures = benchmark.seed(
+            users=6, groups=2, posts=10, comments=5, images=0,
+            max_followers=3, seed=1)
+        results = benchmark.serve(
+            fixtures, views=('index', 'follow_index'), connections=4,
+            requests=8, threads=(2, 4), db_delay=0)
+        self.assertEqual(set(results), {
+            f'{name}:{mode}:{threads}'
+            for name in ('index', 'follow_index')
+            for mode in ('wsgi', 'asgi') for threads in (2, 4)})
+        for name, result in results.items():
+            with self.subTest(mode=name):
+                self.assertEqual(result['status'], 200)
+                self.assertEqual(result['threads'],
+                                 int(name.rpartition(':')[2]))
+                self.assertEqual(result['requests'], 8)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
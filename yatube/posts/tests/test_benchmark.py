@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Follow, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.fixtures = benchmark.seed(
+            users=12, groups=2, posts=30, comments=20, images=0.5,
+            max_followers=6, seed=1)
+
+    def test_seed(self):
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        fan_out = Follow.objects.filter(author=self.fixtures['author'])
+        self.assertEqual(fan_out.count(), 6)
+
+    def test_run_reports_every_view(self):
+        results = benchmark.run(
+            self.fixtures, requests=2, warmup=1, cold=True)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        for name, result in results.items():
+            with self.subTest(view=name):
+                self.assertIn(result['status'], (200, 302))
+                self.assertGreater(result['throughput_rps'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries_max'], 0)
+
+    def test_compare(self):
+        baseline = {'views': {'index': {
+            'throughput_rps': 100, 'p50_ms': 10, 'p99_ms': 20,
+            'queries_mean': 4}}}
+        changes = benchmark.compare(baseline, {'index': {
+            'throughput_rps': 150, 'p50_ms': 5, 'p99_ms': 20,
+            'queries_mean': 3}})
+        self.assertEqual(changes['index'], {
+            'throughput_rps': 50.0, 'p50_ms': -50.0, 'p99_ms': 0.0,
+            'queries_mean': -25.0})
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
@@ -0,0 +1,139 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from .. import blobs, bulk, moderation, thumbnails
+from ..models import ImageBlob, Post, User
+from ..storage import is_blob
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def immediately(callback):
+    callback()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+                   MEDIA_GC_GRACE=0, MODERATION_ASYNC=False)
+@mock.patch('posts.blobs.transaction.on_commit', immediately)
+class ContentAddressedStorageTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'),
+                      ignore_errors=True)
+        cache.clear()
+        default.kvstore.clear()
+
+    def create_post(self, name='meme.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author, text='Пост',
+            image=SimpleUploadedFile(name, content))
+
+    def refcount(self, name):
+        return ImageBlob.objects.get(name=name).refcount
+
+    def test_duplicates_share_file_and_thumbnails(self):
+        first = self.create_post('meme.gif')
+        second = self.create_post('repost.GIF')
+        self.assertTrue(is_blob(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refcount(first.image.name), 2)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1)
+        thumbnails.generate(first.image.name)
+        self.assertEqual(
+            thumbnails.cached_thumbnail(first.image, '960x339').url,
+            thumbnails.cached_thumbnail(second.image, '960x339').url)
+        stats = blobs.savings()
+        self.assertEqual((stats['files'], stats['references']), (1, 2))
+        self.assertEqual(stats['saved'], len(SMALL_GIF))
+
+    def test_edit_and_delete_collect_unreferenced(self):
+        post = self.create_post()
+        other = self.create_post()
+        name = post.image.name
+        thumbnails.generate(name)
+        thumbnail = thumbnails.cached_thumbnail(post.image, '960x339')
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF + b'\x00')
+        post.save()
+        self.assertEqual(self.refcount(name), 1)
+        other.delete()
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertFalse(blobs.storage().exists(name))
+        self.assertFalse(default.storage.exists(thumbnail.name))
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def test_grace_period_keeps_recent_files(self):
+        post = self.create_post()
+        with override_settings(MEDIA_GC_GRACE=3600):
+            post.delete()
+        self.assertEqual(self.refcount(post.image.name), 0)
+        self.assertTrue(blobs.storage().exists(post.image.name))
+
+    def test_bulk_delete_releases(self):
+        names = {self.create_post().image.name for _ in range(3)}
+        moderation.start('delete_posts', Post.all_objects.all())
+        self.assertFalse(ImageBlob.objects.filter(name__in=names).exists())
+
+    def test_imported_duplicate_survives_delete(self):
+        post = self.create_post()
+        list(bulk.import_rows('posts', [{
+            'text': 'Импорт', 'author': 'author', 'image': post.image.name}]))
+        bulk.finalize()
+        self.assertEqual(self.refcount(post.image.name), 2)
+        post.delete()
+        self.assertEqual(blobs.collect(), [])
+        self.assertTrue(blobs.storage().exists(post.image.name))
+
+    @override_settings(MEDIA_GC_GRACE=3600)
+    def test_file_reused_during_collect_is_restored(self):
+        name = self.create_post().image.name
+        Post.objects.get().delete()
+        self.assertEqual(self.refcount(name), 0)
+        # Дубликат загрузили после проверки времени, но до удаления.
+        with mock.patch('posts.blobs._mtime', return_value=0):
+            self.assertEqual(blobs.collect(), [])
+        self.assertTrue(blobs.storage().exists(name))
+        self.assertEqual(self.refcount(name), 0)
+
+    def test_media_gc_command(self):
+        post = self.create_post()
+        ImageBlob.objects.filter(name=post.image.name).update(refcount=5)
+        orphan = blobs.storage().save('posts/orphan.gif',
+                                      ContentFile(SMALL_GIF + b'\x01'))
+        out = io.StringIO()
+        call_command('media_gc', stdout=out)
+        self.assertIn('Новых файлов в учёте: 1', out.getvalue())
+        self.assertIn('Исправлено счётчиков: 1', out.getvalue())
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertFalse(blobs.storage().exists(orphan))
+        self.assertEqual(self.refcount(post.image.name), 1)
@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import search, timeline
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+KINDS = ('groups', 'posts', 'comments', 'follows')
+
+
+class BulkContentTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {index}',
+                                group=self.group if index % 2 else None)
+            for index in range(5)]
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, kind, extension):
+        return os.path.join(self.directory, f'{kind}.{extension}')
+
+    def export(self, extension):
+        for kind in KINDS:
+            call_command('export_content', kind, self.path(kind, extension),
+                         stderr=StringIO())
+
+    def load(self, extension, **options):
+        for kind in KINDS:
+            call_command('import_content', kind, self.path(kind, extension),
+                         stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author__username',
+                'group__slug', 'comment_count')),
+            list(Comment.objects.values_list(
+                'post_id', 'author__username', 'text', 'created')),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username')),
+        )
+
+    def test_round_trip(self):
+        for extension in ('jsonl', 'csv'):
+            with self.subTest(format=extension):
+                before = self.snapshot()
+                self.export(extension)
+                Group.objects.all().delete()
+                User.objects.all().delete()
+                self.load(extension)
+                self.assertEqual(self.snapshot(), before)
+
+    def test_derived_data_rebuilt(self):
+        self.export('jsonl')
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        self.load('jsonl', skip_finalize=False)
+        reader = User.objects.get(username='reader')
+        author = User.objects.get(username='author')
+        self.assertEqual(author.profile.post_count, 5)
+        self.assertEqual(author.profile.follower_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 5)
+        self.assertEqual(
+            set(timeline.timeline_posts(reader)), set(Post.objects.all()))
+        group = Group.objects.get()
+        self.assertEqual(group.post_count, 2)
+        self.assertTrue(search.filter_posts(Post.objects, 'пост').exists())
+        self.assertFalse(reader.has_usable_password())
+
+    def test_resume_after_failure(self):
+        path = self.path('posts', 'jsonl')
+        rows = [{'text': f'Новый пост {index}', 'author': 'author',
+                 'group': 'group'} for index in range(4)]
+        rows[2]['group'] = 'missing'
+        with open(path, 'w') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+        with self.assertRaisesMessage(CommandError, '--offset 2'):
+            call_command('import_content', 'posts', path, batch_size=2,
+                         stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 7)
+        rows[2]['group'] = 'group'
+        with open(path, 'w') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+        call_command('import_content', 'posts', path, batch_size=2,
+                     offset=2, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 9)
+        self.assertEqual(Group.objects.get().post_count, 6)
+
+    def test_export_reports_progress(self):
+        path = self.path('posts', 'jsonl')
+        err = StringIO()
+        call_command('export_content', 'posts', path, chunk_size=2,
+                     stderr=err)
+        lines = err.getvalue().splitlines()
+        self.assertEqual([line.split(' строк')[0] for line in lines[:-1]],
+                         ['posts: 2', 'posts: 4'])
+        self.assertEqual(lines[-1], 'posts: выгружено 5')
+        with open(path) as file:
+            full = file.readlines()
+        with open(path, 'w') as file:
+            file.writelines(full[:4])
+        err = StringIO()
+        call_command('export_content', 'posts', path, chunk_size=2,
+                     offset=4, stderr=err)
+        self.assertEqual(err.getvalue().splitlines(), ['posts: выгружено 1'])
+        with open(path) as file:
+            self.assertEqual(file.readlines(), full)
@@ -0,0 +1,79 @@
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache import BACKENDS, SHARED_ALIAS, cache_config
+from ..models import Post, User
+
+TWO_TIER = cache_config('', environ={'CACHE_TWO_TIER': '1',
+                                     'CACHE_LOCAL_SIZE': '2'})
+
+
+class CacheConfigTests(SimpleTestCase):
+
+    def test_locmem_by_default(self):
+        self.assertEqual(cache_config('cache', environ={}), {
+            'default': {'BACKEND': BACKENDS['locmem']}})
+
+    def test_shared_backend(self):
+        config = cache_config('cache', environ={
+            'CACHE_BACKEND': 'memcached',
+            'CACHE_LOCATION': '127.0.0.1:11211',
+            'CACHE_TWO_TIER': '1',
+        })
+        self.assertEqual(config['default']['BACKEND'],
+                         'core.cache.TwoTierCache')
+        self.assertEqual(config['default']['LOCATION'], SHARED_ALIAS)
+        self.assertEqual(config[SHARED_ALIAS], {
+            'BACKEND': BACKENDS['memcached'],
+            'LOCATION': '127.0.0.1:11211',
+        })
+
+
+@override_settings(CACHES=TWO_TIER)
+class TwoTierCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.shared = caches[SHARED_ALIAS]
+
+    def test_fragments_kept_in_process(self):
+        key = make_template_fragment_key('index_page', [1, 'v1'])
+        cache.set(key, '<html>')
+        self.shared.delete(key)
+        self.assertEqual(cache.get(key), '<html>')
+        cache.delete(key)
+        self.assertIsNone(cache.get(key))
+
+    def test_fragments_loaded_from_shared(self):
+        key = make_template_fragment_key('index_page', [1, 'v1'])
+        self.shared.set(key, '<html>')
+        self.assertEqual(cache.get_many([key, 'missing']), {key: '<html>'})
+        self.shared.delete(key)
+        self.assertEqual(cache.get(key), '<html>')
+
+    def test_mutable_keys_always_shared(self):
+        cache.set('feed-version:index', 'a')
+        self.shared.set('feed-version:index', 'b')
+        self.assertEqual(cache.get('feed-version:index'), 'b')
+        cache.set('post-count:index', 1)
+        self.assertEqual(cache.incr('post-count:index'), 2)
+        self.assertEqual(self.shared.get('post-count:index'), 2)
+
+    def test_local_tier_is_bounded(self):
+        keys = [make_template_fragment_key('page', [number])
+                for number in range(3)]
+        for key in keys:
+            cache.set(key, key)
+        self.shared.delete_many(keys)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertEqual(cache.get(keys[2]), keys[2])
+
+    def test_feed_invalidation(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Первый пост')
+        self.client.get(reverse('posts:index_path'))
+        Post.objects.create(author=author, text='Второй пост')
+        response = self.client.get(reverse('posts:index_path'))
+        self.assertContains(response, 'Второй пост')
@@ -0,0 +1,129 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.db import (ENGINES, SQLITE_PRAGMAS, database_config,
+                     replica_configs)
+from core.db.concurrency import DJANGO_DEFAULTS, measure
+from core.db.sqlite3.base import DatabaseWrapper
+
+
+class DatabaseConfigTests(SimpleTestCase):
+
+    def test_sqlite_by_default(self):
+        config = database_config('db.sqlite3', environ={})
+        self.assertEqual(config['ENGINE'], ENGINES['sqlite3'])
+        self.assertEqual(config['NAME'], 'db.sqlite3')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertEqual(config['OPTIONS']['pragmas'], SQLITE_PRAGMAS)
+
+    def test_environment(self):
+        config = database_config('db.sqlite3', environ={
+            'DB_ENGINE': 'postgresql',
+            'DB_NAME': 'yatube',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '0',
+        })
+        self.assertEqual(config['ENGINE'], ENGINES['postgresql'])
+        self.assertEqual(config['NAME'], 'yatube')
+        self.assertEqual(config['HOST'], 'db')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertNotIn('OPTIONS', config)
+
+    def test_sqlite_pragmas_from_environment(self):
+        config = database_config('db.sqlite3', environ={
+            'SQLITE_SYNCHRONOUS': 'FULL', 'DB_POOL_SIZE': '0'})
+        self.assertEqual(config['OPTIONS']['pragmas']['synchronous'], 'FULL')
+        self.assertEqual(config['OPTIONS']['pool_size'], 0)
+
+    def test_replicas(self):
+        default = database_config('db.sqlite3', environ={})
+        replicas = replica_configs(
+            default, environ={'DB_REPLICAS': 'a.sqlite3, b.sqlite3'})
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual(replicas['replica_2']['NAME'], 'b.sqlite3')
+        self.assertEqual(replicas['replica_2']['TEST'], {'MIRROR': 'default'})
+        server = database_config('db', environ={'DB_ENGINE': 'postgresql'})
+        replicas = replica_configs(server, environ={'DB_REPLICAS': 'db2'})
+        self.assertEqual(replicas['replica_1']['HOST'], 'db2')
+        self.assertEqual(replica_configs(default, environ={}), {})
+
+
+class SQLiteBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': {'pool_size': 1, 'pragmas': SQLITE_PRAGMAS},
+        }, alias='pooled')
+
+    def tearDown(self):
+        self.wrapper.pool.clear()
+        shutil.rmtree(self.directory)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+
+    def test_connection_reused_from_pool(self):
+        self.wrapper.ensure_connection()
+        first = self.wrapper.connection
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.wrapper.ensure_connection()
+        self.assertIs(self.wrapper.connection, first)
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.wrapper.close()
+
+
+class ConcurrencyTests(SimpleTestCase):
+
+    def reader_blocked(self, journal_mode):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db.sqlite3')
+            writer = sqlite3.connect(path, isolation_level=None)
+            writer.execute(f'PRAGMA journal_mode = {journal_mode}')
+            writer.execute('CREATE TABLE post (text TEXT)')
+            writer.execute('BEGIN EXCLUSIVE')
+            writer.execute("INSERT INTO post VALUES ('пост')")
+            reader = sqlite3.connect(path, timeout=0)
+            try:
+                reader.execute('SELECT COUNT(*) FROM post').fetchone()
+            except sqlite3.OperationalError:
+                return True
+            finally:
+                reader.close()
+                writer.execute('ROLLBACK')
+                writer.close()
+            return False
+
+    def test_wal_readers_do_not_wait_for_writer(self):
+        self.assertTrue(self.reader_blocked('DELETE'))
+        self.assertFalse(self.reader_blocked('WAL'))
+
+    def test_measure(self):
+        default = measure(DJANGO_DEFAULTS, readers=1, writers=0,
+                          duration=0.1, rows=10)
+        tuned = measure({'journal_mode': 'WAL'}, readers=1, writers=1,
+                        duration=0.2, rows=10)
+        self.assertGreater(default['reads_per_second'], 0)
+        self.assertEqual(default['writes_per_second'], 0)
+        self.assertGreater(tuned['reads_per_second'], 0)
+        self.assertGreater(tuned['writes_per_second'], 0)
+
+    def test_settings_use_tuned_backend(self):
+        self.assertEqual(settings.DATABASES['default']['ENGINE'],
+                         ENGINES['sqlite3'])
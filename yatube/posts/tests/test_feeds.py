@@ -0,0 +1,97 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import feed_cache
+from ..models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа & Co', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост <{index}>',
+                                group=cls.group if index % 2 else None)
+            for index in range(3)]
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def atom_titles(self, address):
+        feed = ElementTree.fromstring(self.content(self.client.get(address)))
+        return [entry.find(f'{ATOM}content').text
+                for entry in feed.iter(f'{ATOM}entry')]
+
+    def test_atom(self):
+        self.assertEqual(
+            self.atom_titles(reverse('posts:index_feed', args=('atom',))),
+            ['Чужой пост', 'Пост <2>', 'Пост <1>', 'Пост <0>'])
+        self.assertEqual(
+            self.atom_titles(reverse('posts:group_feed',
+                                     args=(self.group.slug, 'atom'))),
+            ['Пост <1>'])
+        self.assertEqual(
+            self.atom_titles(reverse('posts:profile_feed',
+                                     args=(self.author.username, 'atom'))),
+            ['Пост <2>', 'Пост <1>', 'Пост <0>'])
+
+    def test_rss(self):
+        response = self.client.get(reverse('posts:index_feed', args=('rss',)))
+        self.assertEqual(response['Content-Type'],
+                         'application/rss+xml; charset=utf-8')
+        channel = ElementTree.fromstring(self.content(response)).find(
+            'channel')
+        items = channel.findall('item')
+        self.assertEqual(len(items), 4)
+        self.assertTrue(items[0].find('link').text.startswith('http://'))
+
+    def test_json(self):
+        response = self.client.get(
+            reverse('posts:index_feed', args=('json',)))
+        feed = json.loads(self.content(response))
+        self.assertEqual(feed['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual([item['content_text'] for item in feed['items']],
+                         ['Чужой пост', 'Пост <2>', 'Пост <1>', 'Пост <0>'])
+        self.assertEqual(feed['items'][2]['tags'], ['Группа & Co'])
+
+    def test_not_modified(self):
+        address = reverse('posts:index_feed', args=('atom',))
+        response = self.client.get(address)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                address, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_entries_cached_per_post_version(self):
+        address = reverse('posts:index_feed', args=('atom',))
+        self.atom_titles(address)
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(text='Изменено в обход')
+        feed_cache.bump('index')
+        self.assertIn('Пост <0>', self.atom_titles(address))
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertIn('Исправленный пост', self.atom_titles(address))
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            reverse('posts:index_feed', args=('yaml',)))
+        self.assertEqual(response.status_code, 404)
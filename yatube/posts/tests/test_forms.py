@@ -83,7 +83,8 @@ class PostCreateFormTests(TestCase):
         post_object = Post.objects.get(id=posts_count.pop())
         self.check_object(post_object, self.user,
                           form_data['text'], form_data['group'],)
-        self.assertEqual(post_object.image, 'posts/small.gif')
+        self.assertRegex(post_object.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
 
     def test_edit_form(self):
         """Провреяем что форма редактирования поста рабоатет правильно"""
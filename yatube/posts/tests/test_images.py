@@ -0,0 +1,143 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, JpegImagePlugin, PngImagePlugin
+
+from .. import images
+from ..forms import PostForm
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, size=(400, 200), mode='RGB', format_='JPEG', color='red',
+           **options):
+    data = io.BytesIO()
+    Image.new(mode, size, color).save(data, format_, **options)
+    return SimpleUploadedFile(name, data.getvalue())
+
+
+def exif(orientation):
+    data = Image.Exif()
+    data[images.ORIENTATION] = orientation
+    data[0x010F] = 'Камера'
+    return data.tobytes()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+                   POST_IMAGE_MAX_SIDE=100)
+class ImagePipelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_downscale_rotate_and_strip(self):
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'С картинкой',
+            'image': upload('rotated.jpeg', exif=exif(6)),
+        })
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height), (50, 100))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertIn('progressive', image.info)
+            self.assertNotIn('exif', image.info)
+
+    def test_jpeg_decoded_in_draft_mode(self):
+        with mock.patch.object(
+                JpegImagePlugin.JpegImageFile, 'draft', autospec=True,
+                side_effect=JpegImagePlugin.JpegImageFile.draft) as draft:
+            _, width, height = images.process(upload('big.jpg', (800, 400)))
+        self.assertEqual(draft.call_args_list[0],
+                         mock.call(mock.ANY, None, (200, 200)))
+        self.assertEqual((width, height), (100, 50))
+
+    def test_metadata_stripped_from_gif_and_png(self):
+        text = PngImagePlugin.PngInfo()
+        text.add_text('Author', 'Фотограф')
+        cases = {
+            'gif': upload('note.gif', (40, 20), mode='P', format_='GIF',
+                          color=1, comment=b'secret'),
+            'png': upload('note.png', (40, 20), format_='PNG',
+                          pnginfo=text),
+        }
+        for extension, original in cases.items():
+            with self.subTest(format=extension):
+                processed, _, _ = images.process(original)
+                self.assertEqual(processed.name, f'note.{extension}')
+                with Image.open(processed) as image:
+                    self.assertNotIn('comment', image.info)
+                    self.assertNotIn('Author', image.info)
+                    self.assertFalse(images.has_metadata(image))
+
+    def test_opaque_png_stays_png(self):
+        processed, width, _ = images.process(
+            upload('chart.png', (400, 200), format_='PNG'))
+        self.assertEqual(processed.name, 'chart.png')
+        self.assertEqual(width, 100)
+        with Image.open(processed) as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGB'))
+
+    def test_small_image_is_kept(self):
+        original = upload('small.jpg', (40, 20), progressive=True)
+        processed, width, height = images.process(original)
+        self.assertIs(processed, original)
+        self.assertEqual((width, height), (40, 20))
+
+    def test_transparency_stays_lossless(self):
+        logo = {'mode': 'RGBA', 'format_': 'PNG', 'color': (255, 0, 0, 128)}
+        processed, _, _ = images.process(upload('logo.png', **logo))
+        self.assertEqual(processed.name, 'logo.png')
+        with override_settings(POST_IMAGE_FORMAT='WEBP'):
+            processed, _, _ = images.process(upload('logo.png', **logo))
+        self.assertEqual(processed.name, 'logo.webp')
+        with Image.open(processed) as image:
+            self.assertEqual((image.format, image.mode), ('WEBP', 'RGBA'))
+
+    def test_limits(self):
+        with override_settings(POST_IMAGE_MAX_PIXELS=1000):
+            form = PostForm({'text': 'Текст'},
+                            {'image': upload('huge.jpg')})
+            self.assertIn('слишком большая', form.errors['image'][0])
+        with override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=10):
+            form = PostForm({'text': 'Текст'},
+                            {'image': upload('heavy.jpg')})
+            self.assertIn('Файл больше', form.errors['image'][0])
+
+    def test_truncated_image_is_rejected(self):
+        data = upload('broken.jpg', (3000, 3000)).read()
+        form = PostForm({'text': 'Текст'}, {'image': SimpleUploadedFile(
+            'broken.jpg', data[:len(data) // 2])})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_image')
+
+    def test_clearing_image_resets_size(self):
+        post = Post.objects.create(author=self.author, text='Текст')
+        form = PostForm({'text': 'Текст'}, {'image': upload('photo.jpg')},
+                        instance=post)
+        form.save()
+        self.assertEqual(post.image_width, 100)
+        form = PostForm({'text': 'Текст', 'image-clear': 'on'},
+                        instance=post)
+        form.save()
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -32,3 +35,69 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     field, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self):
+        profile = Profile.objects.get(user=self.user)
+        reader = Profile.objects.get(user=self.reader)
+        self.group.refresh_from_db()
+        self.assertEqual(profile.post_count, self.user.posts.count())
+        self.assertEqual(self.group.post_count, self.group.posts.count())
+        self.assertEqual(profile.follower_count,
+                         self.user.following.count())
+        self.assertEqual(reader.following_count,
+                         self.reader.follower.count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_counters_follow_changes(self):
+        """Счётчики обновляются при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        Post.objects.create(author=self.user, text='Второй пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters()
+        post.group = None
+        post.save()
+        self.assertCounters()
+        post.delete()
+        Follow.objects.all().delete()
+        self.assertCounters()
+
+    def test_drifted_counters_stay_non_negative(self):
+        """Удаление при уже нулевом счётчике не нарушает CHECK поля."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.user)
+        Profile.objects.update(
+            post_count=0, follower_count=0, following_count=0)
+        Group.objects.update(post_count=0)
+        Post.objects.update(comment_count=0)
+        Comment.objects.all().delete()
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertCounters()
+
+    def test_recount_command_fixes_drift(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {index}', group=self.group)
+            for index in range(3))
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn('расхождений 1', out.getvalue())
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters()
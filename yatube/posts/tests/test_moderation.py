@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import counters, moderation, search
+from ..models import (Comment, Follow, Group, Post, Profile, TimelineEntry,
+                      User)
+
+
+def no_drift():
+    return not any(counters.reconcile(dry_run=True).values())
+
+
+@override_settings(MODERATION_ASYNC=False, MODERATION_BATCH_SIZE=2)
+class ModerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.other = Group.objects.create(title='Другая', slug='other')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {index}',
+                                group=cls.group if index < 3 else None)
+            for index in range(5)]
+        for post in cls.posts[:2]:
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+
+    def selected(self, count):
+        return Post.all_objects.filter(
+            pk__in=[post.pk for post in self.posts[:count]])
+
+    def test_hide_and_show_posts(self):
+        job = moderation.start('hide_posts', self.selected(3))
+        self.assertEqual(moderation.progress(job),
+                         {'operation': 'hide_posts', 'total': 3, 'done': 3,
+                          'state': 'done'})
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).post_count, 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(search.SearchResults('Пост').count(), 2)
+        self.assertTrue(no_drift())
+        moderation.start('show_posts', self.selected(3))
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 3)
+        self.assertEqual(search.SearchResults('Пост').count(), 5)
+        self.assertTrue(no_drift())
+
+    def test_delete_posts(self):
+        self.assertTrue(TimelineEntry.objects.filter(
+            post=self.posts[0]).exists())
+        moderation.start('delete_posts', self.selected(4))
+        self.assertEqual(Post.all_objects.count(), 1)
+        self.assertFalse(Comment.all_objects.exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__in=[post.pk for post in self.posts[:4]]).exists())
+        self.assertEqual(search.SearchResults('Пост').count(), 1)
+        self.assertTrue(no_drift())
+
+    def test_reassign_group(self):
+        moderation.start('hide_posts', self.selected(1))
+        moderation.start('reassign_group', Post.all_objects.all(),
+                         group_id=self.other.pk)
+        self.assertEqual(
+            Post.all_objects.filter(group=self.other).count(), 5)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.post_count, 4)
+        moderation.start('reassign_group', self.selected(2))
+        self.assertEqual(Post.all_objects.filter(group=None).count(), 2)
+        self.assertTrue(no_drift())
+
+    def test_comments(self):
+        comments = Comment.all_objects.all()
+        moderation.start('hide_comments', comments)
+        self.assertFalse(self.posts[0].comments.exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).comment_count, 0)
+        self.assertTrue(no_drift())
+        moderation.start('show_comments', comments)
+        moderation.start('delete_comments', comments.filter(
+            post=self.posts[0]))
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[1].pk).comment_count, 1)
+        self.assertTrue(no_drift())
+
+    def test_admin_actions(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        address = reverse('admin:posts_post_changelist')
+        response = self.client.post(address, {
+            'action': 'reassign_group',
+            'group': self.other.pk,
+            '_selected_action': [self.posts[3].pk, self.posts[4].pk],
+        }, follow=True)
+        self.assertContains(response, 'ход выполнения')
+        self.assertEqual(Post.objects.filter(group=self.other).count(), 2)
+        response = self.client.post(address, {
+            'action': 'hide_posts',
+            '_selected_action': [self.posts[0].pk],
+        }, follow=True)
+        self.assertEqual(len(list(response.context['messages'])), 1)
+        self.assertNotIn(
+            'delete_selected',
+            dict(response.context['action_form'].fields['action'].choices))
+        self.assertTrue(Post.all_objects.get(pk=self.posts[0].pk).hidden)
+        response = self.client.get(address, {'hidden__exact': '1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+@override_settings(MODERATION_ASYNC=False)
+class ModerationCacheTests(TransactionTestCase):
+    def test_pages_and_counts_follow_hide(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Скрываемый пост')
+        cache.clear()
+        address = reverse('posts:index_path')
+        self.assertContains(self.client.get(address), 'Скрываемый пост')
+        moderation.start('hide_posts', Post.all_objects.all())
+        self.assertNotContains(self.client.get(address), 'Скрываемый пост')
+        self.assertEqual(self.client.get(reverse(
+            'posts:post_detail', args=(post.pk,))).status_code, 404)
+        moderation.start('show_posts', Post.all_objects.all())
+        self.assertContains(self.client.get(address), 'Скрываемый пост')
@@ -1,11 +1,19 @@
+import io
 import math
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.conf import settings
+from django.template.loader import render_to_string
 from django.urls import reverse
 
 from ..models import Post, Group
+from ..paginators import count_key
 
 
 User = get_user_model()
@@ -54,3 +62,141 @@ class PaginatorTests(TestCase):
                     (self.POST_COUNT
                      - (settings.POSTS_PER_PAGE
                         * (self.PAGE_COUNT) - settings.POSTS_PER_PAGE)))
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.POST_COUNT = 14
+        Post.objects.bulk_create(
+            Post(text=f'Пост №{index}', author=cls.user)
+            for index in range(cls.POST_COUNT))
+        cls.ordered_ids = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_ids(self, cursor):
+        response = self.client.get(
+            reverse('posts:index_path'), {'cursor': cursor})
+        page_obj = response.context['page_obj']
+        return [post.id for post in page_obj], page_obj
+
+    def test_cursor_pages_follow_keyset_order(self):
+        """Курсоры ведут вперёд и назад без пропусков и дублей."""
+        first_ids, first_page = self.get_ids('')
+        self.assertEqual(first_ids,
+                         self.ordered_ids[:settings.POSTS_PER_PAGE])
+        self.assertFalse(first_page.has_previous())
+        second_ids, second_page = self.get_ids(first_page.next_cursor)
+        self.assertEqual(second_ids,
+                         self.ordered_ids[settings.POSTS_PER_PAGE:])
+        self.assertFalse(second_page.has_next())
+        back_ids, _ = self.get_ids(second_page.previous_cursor)
+        self.assertEqual(back_ids, first_ids)
+
+    def test_cursor_stable_under_inserts(self):
+        """Новые посты не сдвигают следующую страницу."""
+        _, first_page = self.get_ids('')
+        Post.objects.create(text='Новый пост', author=self.user)
+        second_ids, _ = self.get_ids(first_page.next_cursor)
+        self.assertEqual(second_ids,
+                         self.ordered_ids[settings.POSTS_PER_PAGE:])
+
+    def test_invalid_cursor_returns_first_page(self):
+        ids, page_obj = self.get_ids('не-курсор')
+        self.assertEqual(ids, self.ordered_ids[:settings.POSTS_PER_PAGE])
+        self.assertEqual(page_obj.cursor, '')
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_profile_cursor_pages_skip_count(self):
+        """Страницы профиля по курсору не считают посты и не делят
+        кэш фрагмента между собой."""
+        address = reverse('posts:profile',
+                          kwargs={'username': self.user.username})
+        first = self.client.get(address).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address,
+                                       {'cursor': first.next_cursor})
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'COUNT(' in query['sql']])
+        page_obj = response.context['page_obj']
+        self.assertEqual((page_obj.number, page_obj.cursor),
+                         (1, first.next_cursor))
+        self.assertContains(response, 'Пост №0')
+
+    def test_cursor_links_keep_query(self):
+        _, first_page = self.get_ids('')
+        html = render_to_string('includes/paginator.html', {
+            'page_obj': first_page, 'query_prefix': 'q=%D0%BF&'})
+        self.assertIn(f'href="?q=%D0%BF&amp;cursor={first_page.next_cursor}"',
+                      html)
+
+
+@override_settings(PAGINATOR_PAGE_RANGE=3)
+class CountedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовый текст',
+            slug='test-slug',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост №{index}', author=cls.user)
+            for index in range(settings.POSTS_PER_PAGE * 5))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_count_read_from_cache(self):
+        """Повторный запрос страницы не выполняет COUNT(*)."""
+        self.client.force_login(self.user)
+        address = reverse('posts:profile',
+                          kwargs={'username': self.user.username})
+        self.client.get(address)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         Post.objects.filter(author=self.user).count())
+
+    def test_counters_follow_post_changes(self):
+        self.client.get(reverse('posts:index_path'))
+        self.client.get(reverse('posts:group_list',
+                                kwargs={'slug': self.group.slug}))
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        self.assertEqual(cache.get(count_key('index')),
+                         Post.objects.count())
+        self.assertEqual(cache.get(count_key(f'group:{self.group.id}')), 1)
+        post.delete()
+        self.assertEqual(cache.get(count_key('index')),
+                         Post.objects.count())
+        self.assertEqual(cache.get(count_key(f'group:{self.group.id}')), 0)
+
+    @override_settings(POST_COUNT_TIMEOUT=60)
+    def test_counts_expire_and_reset_on_recount(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.client.get(reverse('posts:index_path'))
+        add.assert_any_call(count_key('index'), Post.objects.count(), 60)
+        cache.set(count_key('index'), 1)
+        cache.set(count_key(f'author:{self.user.id}'), 1)
+        call_command('recount_counters', stdout=io.StringIO())
+        self.assertIsNone(cache.get(count_key('index')))
+        self.assertIsNone(cache.get(count_key(f'author:{self.user.id}')))
+
+    def test_index_page_range_is_capped(self):
+        response = self.client.get(reverse('posts:index_path'),
+                                   {'page': 3})
+        self.assertEqual(list(response.context['page_obj'].page_range),
+                         [2, 3, 4])
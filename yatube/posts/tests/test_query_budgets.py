@@ -0,0 +1,144 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import instrumentation
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, color):
+    data = io.BytesIO()
+    Image.new('RGB', (40, 20), color).save(data, 'JPEG')
+    return SimpleUploadedFile(name, data.getvalue())
+
+
+class QueryBudgetTests(TestCase):
+    """Каждый view укладывается в объявленный бюджет SQL-запросов
+    при холодном кэше и не повторяет запросы (N+1)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовый текст',
+            slug='test-slug',
+        )
+        for index in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Пост {index}', group=cls.group)
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def check_budget(self, response):
+        stats = response.instrumentation
+        with self.subTest(view=stats.view_name):
+            self.assertIsNotNone(stats.budget)
+            self.assertLessEqual(stats.queries, stats.budget)
+            self.assertEqual(stats.duplicates, {})
+            self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_read_views_within_budget(self):
+        addresses = [
+            reverse('posts:index_path'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_comments',
+                    kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        ]
+        for address in addresses:
+            cache.clear()
+            self.check_budget(self.client.get(address))
+
+    def test_write_views_within_budget(self):
+        post_id = {'post_id': self.post.id}
+        username = {'username': self.author.username}
+        self.check_budget(self.author_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': self.group.id}))
+        self.check_budget(self.author_client.post(
+            reverse('posts:post_edit', kwargs=post_id),
+            {'text': 'Новый текст'}))
+        self.check_budget(self.client.post(
+            reverse('posts:add_comment', kwargs=post_id),
+            {'text': 'Комментарий'}))
+        self.check_budget(self.client.get(
+            reverse('posts:profile_unfollow', kwargs=username)))
+        self.check_budget(self.client.get(
+            reverse('posts:profile_follow', kwargs=username)))
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_GC_GRACE=0)
+    @mock.patch('posts.thumbnails._get_executor')
+    @mock.patch('django.db.transaction.on_commit', lambda callback: callback())
+    def test_image_views_within_budget(self, executor):
+        """Бюджеты покрывают загрузку картинки, учёт файлов и постановку
+        миниатюр в очередь, а ленты — поиск готовых миниатюр."""
+        for color in ('red', 'red', 'blue'):
+            self.check_budget(self.author_client.post(
+                reverse('posts:post_create'),
+                {'text': 'С картинкой', 'group': self.group.id,
+                 'image': upload('photo.jpg', color)}))
+        post = Post.objects.filter(author=self.author).first()
+        self.check_budget(self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Новая картинка', 'image': upload('new.jpg', 'green')}))
+        self.assertTrue(executor.return_value.submit.called)
+        addresses = [
+            reverse('posts:index_path'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': post.id}),
+            reverse('posts:follow_index'),
+        ]
+        for address in addresses:
+            cache.clear()
+            self.check_budget(self.client.get(address))
+
+    def test_stats_endpoint(self):
+        instrumentation.reset()
+        self.client.get(reverse('posts:index_path'))
+        self.assertEqual(
+            self.client.get(reverse('core:request_stats')).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get(reverse('core:request_stats')).json()
+        self.assertEqual(stats['posts:index_path']['requests'], 1)
+
+    def test_duplicate_signature(self):
+        self.assertEqual(
+            instrumentation.signature(
+                "SELECT * FROM t WHERE id = 15 AND name = 'x'"),
+            instrumentation.signature(
+                "SELECT * FROM t WHERE id = 7 AND name = 'y'"))
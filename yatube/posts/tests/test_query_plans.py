@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+CO_ROUTINE = re.compile(r'^CO-ROUTINE (\w+)$')
+GLOBAL_INDEX = re.compile(r'\bpost_(hidden_)?pub_date_idx\b')
+
+
+class FeedQueryPlanTests(TestCase):
+    """Запросы лент не должны сканировать таблицы целиком
+    и сортировать результат во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовый текст',
+            slug='test-slug',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый текст', group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def feed_plans(self, address):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(address)
+        return [
+            (query['sql'], self.explain(query['sql']))
+            for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and ('"posts_post"' in query['sql']
+                 or '"posts_comment"' in query['sql'])
+        ]
+
+    def check_plans(self, address, allow_sort=False):
+        plans = self.feed_plans(address)
+        self.assertTrue(plans, address)
+        for sql, plan in plans:
+            # Производная таблица с LIMIT читается целиком, но она
+            # уже ограничена; сканировать нельзя только таблицы.
+            derived = {match.group(1) for match in map(CO_ROUTINE.match, plan)
+                       if match}
+            with self.subTest(address=address, sql=sql):
+                self.assertFalse(
+                    [step for step in plan if FULL_SCAN.match(step)
+                     and step.split()[-1] not in derived],
+                    plan)
+                if not allow_sort:
+                    self.assertFalse(
+                        [step for step in plan if 'TEMP B-TREE' in step],
+                        plan)
+
+    def test_feed_query_plans(self):
+        addresses = [
+            reverse('posts:index_path'),
+            reverse('posts:index_path') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for address in addresses:
+            self.check_plans(address)
+
+    def test_follow_query_plans(self):
+        """Лента подписок сортирует не больше TIMELINE_SIZE постов,
+        поэтому временное B-дерево допустимо, полный скан и обход
+        общего индекса постов по дате — нет."""
+        address = reverse('posts:follow_index')
+        self.check_plans(address, allow_sort=True)
+        for sql, plan in self.feed_plans(address):
+            with self.subTest(sql=sql):
+                self.assertFalse(
+                    [step for step in plan if GLOBAL_INDEX.search(step)],
+                    plan)
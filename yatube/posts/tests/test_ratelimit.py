@@ -0,0 +1,95 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import instrumentation, ratelimit
+from ..models import Follow, Post, User
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(ratelimit.take('test', 'a', 3, 60, now=100), 0)
+        self.assertEqual(ratelimit.take('test', 'a', 3, 60, now=100), 20)
+        self.assertEqual(ratelimit.take('test', 'a', 3, 60, now=110), 10)
+        self.assertEqual(ratelimit.take('test', 'a', 3, 60, now=120), 0)
+        self.assertEqual(ratelimit.take('test', 'a', 3, 60, now=120), 20)
+
+    def test_rejections_do_not_drain(self):
+        for _ in range(2):
+            ratelimit.take('test', 'a', 2, 10, now=0)
+        for _ in range(5):
+            self.assertTrue(ratelimit.take('test', 'a', 2, 10, now=1))
+        self.assertEqual(ratelimit.take('test', 'a', 2, 10, now=5), 0)
+
+    def test_idle_bucket_is_full(self):
+        ratelimit.take('test', 'a', 2, 10, now=0)
+        ratelimit.take('test', 'a', 2, 10, now=0)
+        for _ in range(2):
+            self.assertEqual(ratelimit.take('test', 'a', 2, 10, now=100), 0)
+        self.assertTrue(ratelimit.take('test', 'a', 2, 10, now=100))
+
+    def test_non_atomic_cache_warns(self):
+        file_cache = FileBasedCache(tempfile.gettempdir(), {})
+        self.assertTrue(ratelimit.is_atomic(caches['default']))
+        self.assertFalse(ratelimit.is_atomic(file_cache))
+        self.assertEqual(ratelimit.check_cache(), [])
+        with mock.patch('core.ratelimit.caches', {'default': file_cache}):
+            self.assertEqual([warning.id for warning
+                              in ratelimit.check_cache()], ['core.W001'])
+
+    def test_keys_are_separate(self):
+        ratelimit.take('test', 'a', 1, 60, now=0)
+        self.assertEqual(ratelimit.take('test', 'b', 1, 60, now=0), 0)
+        self.assertEqual(ratelimit.take('other', 'a', 1, 60, now=0), 0)
+
+
+@override_settings(RATE_LIMITS={'post': (2, 60), 'follow': (1, 60)})
+class RateLimitViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset()
+        self.client.force_login(self.user)
+
+    def test_post_create_throttled(self):
+        address = reverse('posts:post_create')
+        for _ in range(2):
+            self.client.post(address, {'text': 'Пост'})
+        response = self.client.post(address, {'text': 'Лишний'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertFalse(Post.objects.filter(text='Лишний').exists())
+        self.assertEqual(self.client.get(address).status_code, 200)
+        self.assertEqual(
+            instrumentation.aggregated()['posts:post_create']['rate_limited'],
+            1)
+
+    def test_other_user_not_throttled(self):
+        address = reverse('posts:post_create')
+        for _ in range(3):
+            self.client.post(address, {'text': 'Пост'})
+        self.client.force_login(self.author)
+        response = self.client.post(address, {'text': 'Другой автор'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_follow_and_api_share_bucket(self):
+        self.client.get(reverse('posts:profile_follow', args=('author',)))
+        self.assertTrue(Follow.objects.filter(user=self.user).exists())
+        response = self.client.delete(
+            reverse('api:follow', args=('author',)))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('detail', response.json())
+        self.assertTrue(Follow.objects.filter(user=self.user).exists())
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db.routers import PIN_COOKIE
+from ..models import Follow, Post
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Реплика — отдельный файл SQLite, который sync_replica()
+    догоняет до основной базы, как это делала бы репликация."""
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'core.db.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory)
+
+    def sync_replica(self):
+        primary, replica = connections['default'], connections[REPLICA]
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.client.force_login(self.author)
+        self.sync_replica()
+
+    def feed(self, address):
+        response = self.client.get(address)
+        return list(response.context['page_obj'])
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_feeds_read_from_replica(self):
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed(reverse('posts:index_path')), [])
+        self.sync_replica()
+        cache.clear()
+        self.assertEqual(self.feed(reverse('posts:index_path')), [post])
+
+    def test_changed_feed_cached_until_replica_settles(self):
+        """Читатели изменённой ленты остаются на реплике, а собранное по
+        отставшей реплике не живёт в кэше дольше окна отставания."""
+        self.client.logout()
+        Post.objects.create(author=self.author, text='Новый пост')
+        address = reverse('posts:index_path')
+        self.assertNotContains(self.client.get(address), 'Новый пост')
+        self.sync_replica()
+        self.assertNotContains(self.client.get(address), 'Новый пост')
+        with mock.patch('posts.feed_cache.is_recent', return_value=False):
+            self.assertContains(self.client.get(address), 'Новый пост')
+
+    def test_search_reads_from_replica(self):
+        Post.objects.create(author=self.author, text='Новый пост')
+        address = reverse('posts:search') + '?q=новый'
+        self.assertEqual(self.feed(address), [])
+        self.sync_replica()
+        self.assertEqual([post.text for post in self.feed(address)],
+                         ['Новый пост'])
+
+    def test_writer_reads_own_writes(self):
+        with mock.patch('posts.feed_cache.is_recent',
+                        return_value=False):
+            response = self.client.post(
+                reverse('posts:post_create'), {'text': 'Мой пост'})
+            self.assertIn(PIN_COOKIE, response.cookies)
+            self.assertFalse(Post.objects.using(REPLICA).exists())
+            posts = self.feed(reverse(
+                'posts:profile', args=(self.author.username,)))
+            self.assertEqual([post.text for post in posts], ['Мой пост'])
+            self.client.cookies.pop(PIN_COOKIE)
+            cache.clear()
+            self.assertEqual(self.feed(reverse(
+                'posts:profile', args=(self.author.username,))), [])
+
+    def test_follower_reads_own_follow(self):
+        """Подписка по GET тоже закрепляет за основной базой."""
+        User.objects.create_user(username='reader')
+        self.client.force_login(User.objects.get(username='reader'))
+        response = self.client.get(reverse(
+            'posts:profile_follow', args=(self.author.username,)))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(Follow.objects.using(REPLICA).exists())
+        response = self.client.get(reverse(
+            'posts:profile', args=(self.author.username,)))
+        self.assertTrue(response.context['following'])
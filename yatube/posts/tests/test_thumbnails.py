@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Follow, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+        default.kvstore.clear()
+
+    def create_post(self):
+        uploaded = SimpleUploadedFile(
+            name='small.gif', content=SMALL_GIF, content_type='image/gif')
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        lambda callback: callback()):
+            self.response = self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост', 'image': uploaded})
+        return Post.objects.get(author=self.user)
+
+    def test_feed_falls_back_to_original(self):
+        """Пока миниатюры нет, лента отдаёт оригинал и не зовёт Pillow."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        self.assertIsNone(thumbnails.cached_thumbnail(post.image, '960x339'))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, post.image.url)
+
+    def test_post_create_generates_thumbnail(self):
+        post = self.create_post()
+        stats = self.response.instrumentation
+        self.assertLessEqual(stats.queries, stats.budget)
+        thumbnail = thumbnails.cached_thumbnail(post.image, '960x339')
+        self.assertIsNotNone(thumbnail)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, thumbnail.url)
+
+    def test_sync_generation_keeps_connection(self):
+        """Синхронная генерация в потоке сервера не закрывает его
+        соединение, а поток пула — закрывает своё."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        with mock.patch.object(connection, 'close') as close:
+            thumbnails._submit(post.image.name)
+            close.assert_not_called()
+            thumbnails._generate_in_background(post.image.name)
+            close.assert_called_once_with()
+
+    def test_generation_refreshes_cached_feeds(self):
+        """Готовая миниатюра видна в закэшированных лентах сразу."""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        reader = Client()
+        reader.force_login(follower)
+        pages = {
+            'index': (Client(), reverse('posts:index_path')),
+            'profile': (Client(), reverse(
+                'posts:profile', kwargs={'username': self.user.username})),
+            'post': (Client(), reverse(
+                'posts:post_detail', kwargs={'post_id': post.id})),
+            'follow': (reader, reverse('posts:follow_index')),
+        }
+        for client, address in pages.values():
+            self.assertContains(client.get(address), post.image.url)
+        thumbnails.generate(post.image.name)
+        thumbnail = thumbnails.cached_thumbnail(post.image, '960x339')
+        for name, (client, address) in pages.items():
+            with self.subTest(page=name):
+                self.assertContains(client.get(address), thumbnail.url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailBatchTests(TestCase):
+    """Число обращений к key-value хранилищу sorl на страницу ленты."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        default.kvstore.clear()
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {index}',
+                image=SimpleUploadedFile(f'small{index}.gif',
+                                         SMALL_GIF + bytes([index])))
+            for index in range(settings.POSTS_PER_PAGE)]
+        for post in cls.posts:
+            thumbnails.generate(post.image.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def kvstore_lookups(self, render):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        return len([query for query in queries.captured_queries
+                    if 'thumbnail_kvstore' in query['sql']])
+
+    def test_page_resolved_in_one_lookup(self):
+        posts = list(Post.objects.all())
+        per_post = self.kvstore_lookups(lambda: [
+            thumbnails.cached_thumbnail(post.image, '960x339')
+            for post in posts])
+        batched = self.kvstore_lookups(
+            lambda: thumbnails.prefetch_thumbnails(posts, '960x339'))
+        self.assertEqual(per_post, settings.POSTS_PER_PAGE)
+        self.assertEqual(batched, 1)
+        for post in posts:
+            self.assertEqual(
+                post.thumbnail_url,
+                thumbnails.cached_thumbnail(post.image, '960x339').url)
+
+    def test_index_page_resolved_in_one_lookup(self):
+        lookups = self.kvstore_lookups(
+            lambda: self.client.get(reverse('posts:index_path')))
+        self.assertEqual(lookups, 1)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -7,8 +8,12 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, Follow
+from .. import feed_cache
+from ..models import Comment, Post, Group, Follow, TimelineEntry
 from ..forms import PostForm
 
 
@@ -138,15 +143,105 @@ class CacheTest(TestCase):
         response_before_delete = self.author_post.get(
             reverse('posts:index_path'))
         self.assertIn(self.post.text, response_before_delete.content.decode())
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response_cached = self.author_post.get(
+            reverse('posts:index_path'))
+        self.assertIn(self.post.text, response_cached.content.decode())
         self.post.delete()
         response_after_delete = self.author_post.get(
             reverse('posts:index_path'))
-        self.assertIn(self.post.text, response_after_delete.content.decode())
-        cache.clear()
-        response_after_cache_clear = self.author_post.get(
-            reverse('posts:index_path'))
         self.assertNotIn(
-            self.post.text, response_after_cache_clear.content.decode())
+            self.post.text, response_after_delete.content.decode())
+
+    def test_cache_follow_per_user(self):
+        """Фрагмент ленты подписок не общий для разных пользователей."""
+        cache.clear()
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(self.post.text, response.content.decode())
+        response = self.author_post.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post.text, response.content.decode())
+        Follow.objects.filter(user=reader).delete()
+        response = reader_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(self.post.text, response.content.decode())
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый текст', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.addresses = (
+            reverse('posts:index_path'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_anonymous_pages_cached(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                first = self.client.get(address)
+                Post.objects.filter(pk=self.post.pk).update(text='Другой')
+                second = self.client.get(address)
+                Post.objects.filter(pk=self.post.pk).update(
+                    text=self.post.text)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+                self.assertIn('Last-Modified', second)
+
+    def test_not_modified(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                etag = self.client.get(address)['ETag']
+                with self.assertNumQueries(1 if address != '/' else 0):
+                    response = self.client.get(
+                        address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_invalidate_pages(self):
+        etags = {address: self.client.get(address)['ETag']
+                 for address in self.addresses}
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        for address, etag in etags.items():
+            with self.subTest(address=address):
+                response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Исправленный текст')
+        self.post.text = 'Тестовый текст'
+        self.post.save()
+
+    def test_comment_invalidates_post_page(self):
+        address = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(address)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий')
+        self.assertContains(self.client.get(address), 'Новый комментарий')
+
+    def test_authenticated_not_cached(self):
+        self.client.force_login(self.user)
+        address = reverse('posts:index_path')
+        response = self.client.get(address)
+        self.assertNotIn('ETag', response)
+        self.assertIsNotNone(response.context)
+
+    def test_missing_page(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=('no-such-group',)))
+        self.assertEqual(response.status_code, 404)
 
 
 class FollowTest(TestCase):
@@ -185,3 +280,179 @@ class FollowTest(TestCase):
         response_second = self.follower_cleint.get(
             reverse('posts:follow_index'))
         self.assertNotIn(self.post, response_second.context['page_obj'])
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def follow_page(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_fan_out_and_purge(self):
+        """Подписка заполняет ленту, новый пост раскладывается в неё,
+        отписка очищает."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+        Follow.objects.filter(user=self.follower, author=self.author).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts_merged_on_read(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(new_post.merged_on_read)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_post_bumps_author_version(self):
+        """Пост знаменитости не трогает версии лент подписчиков, но
+        закэшированная лента подписок всё равно обновляется."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        cache.clear()
+        self.follow_page()
+        follow_version = feed_cache.version(f'follow:{self.follower.id}')
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            feed_cache.version(f'follow:{self.follower.id}'), follow_version)
+        self.assertContains(
+            self.follower_client.get(reverse('posts:follow_index')),
+            new_post.text)
+
+    def test_save_reuses_loaded_state(self):
+        """Перед save() загруженного поста группа и картинка не
+        перечитываются из базы."""
+        post = Post.objects.get(pk=self.old_post.pk)
+        post.text = 'Правка'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "posts_post"."group_id"')])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_posts_kept_when_author_leaves_celebrity_mode(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+        later = Post.objects.create(author=self.author, text='Позже')
+        self.assertFalse(later.merged_on_read)
+        self.assertEqual(self.follow_page(),
+                         [later, new_post, self.old_post])
+
+    @override_settings(TIMELINE_SIZE=2)
+    def test_timeline_trimmed(self):
+        """Чтение ленты ничего не пишет: лишнее убирает trim_timelines."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        for index in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {index}')
+        self.assertEqual(len(self.follow_page()), 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 4)
+        call_command('trim_timelines', stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 2)
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {index}')
+            for index in range(5)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_comments_bounded(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:3])
+        self.assertTrue(comments.has_next())
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            {'comments': comments.next_cursor})
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[3:])
+
+    def test_comments_endpoint(self):
+        """Следующие страницы отдаются HTML-фрагментом и JSON."""
+        address = reverse('posts:post_comments',
+                          kwargs={'post_id': self.post.id})
+        first = self.client.get(address, {'format': 'json'}).json()
+        self.assertEqual([item['id'] for item in first['comments']],
+                         [comment.id for comment in self.comments[:3]])
+        second = self.client.get(
+            address, {'format': 'json', 'cursor': first['next_cursor']})
+        self.assertEqual([item['text'] for item in second.json()['comments']],
+                         [comment.text for comment in self.comments[3:]])
+        self.assertIsNone(second.json()['next_cursor'])
+        fragment = self.client.get(
+            address, {'cursor': first['next_cursor']})
+        self.assertTemplateUsed(fragment, 'includes/comment_list.html')
+        self.assertContains(fragment, self.comments[4].text)
+        self.assertNotContains(fragment, self.comments[0].text)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки любят спать на солнце')
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки любят гулять')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_posts(self):
+        self.assertEqual(self.search('кошки'), [self.cats])
+        self.assertEqual(set(self.search('ЛЮБЯТ')), {self.cats, self.dogs})
+        self.assertEqual(self.search('гуля'), [self.dogs])
+        self.assertEqual(self.search('"; DROP'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.dogs.text = 'Собаки любят кости'
+        self.dogs.save()
+        self.assertEqual(self.search('гулять'), [])
+        self.assertEqual(self.search('кости'), [self.dogs])
+        self.cats.delete()
+        self.assertEqual(self.search('кошки'), [])
+
+    def test_rebuild_command(self):
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Попугаи умеют говорить')])
+        self.assertEqual(self.search('попугаи'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('попугаи')), 1)
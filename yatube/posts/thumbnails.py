@@ -0,0 +1,172 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+post_create и post_edit ставят картинку в очередь пула потоков после
+коммита транзакции, а шаблоны только ищут готовую миниатюру в
+key-value хранилище sorl и, пока её нет, показывают оригинал. Так
+запрос ленты никогда не ждёт Pillow. Когда миниатюры готовы, версии
+лент с постами этой картинки сбрасываются, иначе закэшированные
+фрагменты и страницы анонимов продолжали бы отдавать оригинал.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.instrumentation import untracked
+
+from . import feed_cache, timeline
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def source(file_):
+    """ImageFile картинки поста; имя ищется в хранилище Post.image."""
+    return ImageFile(file_, getattr(file_, 'storage', None)
+                     or Post._meta.get_field('image').storage)
+
+
+def bump_feeds(name):
+    """Сбрасывает ленты всех постов с картинкой name."""
+    posts = list(Post.objects.filter(image=name)
+                 .values_list('pk', 'author_id', 'group_id'))
+    if not posts:
+        return
+    author_ids = {author_id for _, author_id, _ in posts}
+    group_ids = {group_id for _, _, group_id in posts} - {None}
+    feed_cache.bump(
+        'index',
+        *(f'post:{pk}' for pk, _, _ in posts),
+        *(f'profile:{author_id}' for author_id in author_ids),
+        *(f'group:{group_id}' for group_id in group_ids),
+        *timeline.follow_feeds(author_ids),
+    )
+
+
+def generate(name):
+    """Создаёт все миниатюры POST_THUMBNAIL_SIZES для файла и сбрасывает
+    ленты, где он показан."""
+    try:
+        for geometry in settings.POST_THUMBNAIL_SIZES:
+            get_thumbnail(source(name), geometry)
+        bump_feeds(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _generate_in_background(name):
+    """generate() в потоке пула: соединение потока закрывается, иначе
+    оно висело бы открытым до следующей картинки."""
+    try:
+        generate(name)
+    finally:
+        connection.close()
+
+
+def _submit(name):
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if settings.THUMBNAIL_ASYNC:
+        _get_executor().submit(_generate_in_background, name)
+    else:
+        # Синхронный режим — не часть запроса: его SQL не должен
+        # попадать в бюджет view.
+        with untracked():
+            generate(name)
+
+
+def schedule(post):
+    """Ставит картинку поста в очередь после коммита транзакции."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: _submit(name))
+
+
+def thumbnail_file(file_, geometry):
+    """ImageFile миниатюры с тем же именем, что даёт {% thumbnail %}."""
+    backend = default.backend
+    image = source(file_)
+    options = {}
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options['format'] = backend._get_format(image)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(image, geometry, options),
+        default.storage)
+
+
+def cached_thumbnail(file_, geometry):
+    """Готовая миниатюра или None; изображение не декодируется."""
+    if not file_:
+        return None
+    return default.kvstore.get(thumbnail_file(file_, geometry))
+
+
+def _get_many_raw(kvstore, keys):
+    """Пакетный аналог KVStore._get_raw: get_many в кэш и один запрос
+    к таблице sorl для промахов."""
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kvstore.cache.get_many(keys)
+    missing = set(keys) - set(values)
+    if missing:
+        found = dict(KVStoreModel.objects.filter(key__in=missing)
+                     .values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {key: found.get(key, empty) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {key: value for key, value in values.items()
+            if value != empty}
+
+
+def prefetch_thumbnails(posts, geometry):
+    """Проставляет post.thumbnail_url всем постам страницы за один
+    обход кэша и один запрос к key-value хранилищу."""
+    kvstore = default.kvstore
+    files = {post: thumbnail_file(post.image, geometry)
+             for post in posts if post.image}
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        for post, thumbnail in files.items():
+            cached = kvstore.get(thumbnail)
+            post.thumbnail_url = cached.url if cached else post.image.url
+        return
+    keys = {post: add_prefix(thumbnail.key)
+            for post, thumbnail in files.items()}
+    values = _get_many_raw(kvstore, list(set(keys.values())))
+    for post, key in keys.items():
+        post.thumbnail_url = (
+            deserialize_image_file(values[key]).url
+            if key in values else post.image.url)
@@ -0,0 +1,174 @@
+"""Материализованные ленты подписок (fan-out on write).
+
+Новый пост раскладывается в ленты подписчиков автора, а follow_index
+читает готовый список вместо соединения Post с Follow. Посты авторов
+с числом подписчиков от TIMELINE_CELEBRITY_FOLLOWERS в ленты не
+раскладываются: у них ставится merged_on_read, и при чтении они
+подмешиваются от всех авторов подписок. Режим записан в самом посте,
+поэтому ни один пост не пропадает из лент, когда автор переходит порог
+в любую сторону.
+
+Ленты обрезаются до TIMELINE_SIZE при подписке и командой
+trim_timelines; чтение берёт из ленты не больше TIMELINE_SIZE свежих
+постов и ничего не пишет.
+"""
+from itertools import groupby
+
+from django.conf import settings
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+def is_celebrity(author):
+    return Profile.objects.filter(
+        user=author,
+        follower_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+    ).exists()
+
+
+def follower_ids(author_id):
+    return list(Follow.objects.filter(author=author_id)
+                .values_list('user_id', flat=True))
+
+
+def followed_celebrities(user_id):
+    """id знаменитостей среди авторов, на которых подписан user_id."""
+    return list(Follow.objects.filter(
+        user=user_id,
+        author__profile__follower_count__gte=(
+            settings.TIMELINE_CELEBRITY_FOLLOWERS),
+    ).values_list('author_id', flat=True))
+
+
+def follow_feeds(author_ids):
+    """Версии лент подписок, которые меняет пост любого из авторов.
+
+    Лента подписок читателя зависит от follow:<читатель> и от
+    author:<id> каждой знаменитости из его подписок, поэтому пост
+    знаменитости сбрасывает одну версию author:<id>, а не версии всех
+    её подписчиков.
+    """
+    author_ids = set(author_ids)
+    celebrities = set(Profile.objects.filter(
+        user__in=author_ids,
+        follower_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+    ).values_list('user_id', flat=True))
+    followers = (Follow.objects.filter(author__in=author_ids - celebrities)
+                 .values_list('user_id', flat=True).distinct())
+    return [*(f'author:{author_id}' for author_id in celebrities),
+            *(f'follow:{user_id}' for user_id in followers)]
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора или, если автор —
+    знаменитость, помечает его для подмешивания при чтении. Возвращает
+    затронутые версии лент подписок, как follow_feeds()."""
+    if is_celebrity(post.author_id):
+        Post.all_objects.filter(pk=post.pk).update(merged_on_read=True)
+        post.merged_on_read = True
+        return [f'author:{post.author_id}']
+    followers = follower_ids(post.author_id)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        ignore_conflicts=True,
+    )
+    return [f'follow:{user_id}' for user_id in followers]
+
+
+def trim(user):
+    """Оставляет в ленте пользователя не больше TIMELINE_SIZE постов."""
+    oldest_kept = (TimelineEntry.objects.filter(user=user)
+                   .order_by('-pub_date')
+                   .values_list('pub_date', flat=True)
+                   [settings.TIMELINE_SIZE - 1:settings.TIMELINE_SIZE])
+    if oldest_kept:
+        TimelineEntry.objects.filter(
+            user=user, pub_date__lt=oldest_kept[0]).delete()
+
+
+def trim_all():
+    """Обрезает все ленты; возвращает число обработанных пользователей."""
+    users = (TimelineEntry.objects.order_by().values_list('user', flat=True)
+             .distinct())
+    trimmed = 0
+    for user_id in users.iterator():
+        trim(user_id)
+        trimmed += 1
+    return trimmed
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту свежими разложенными постами автора после
+    подписки; подмешиваемые придут при чтении."""
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in Post.objects.filter(
+             author=author_id, merged_on_read=False)
+         .values_list('id', 'pub_date')[:settings.TIMELINE_SIZE]),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def purge(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author=author_id).delete()
+
+
+def rebuild(chunk_size=2000):
+    """Дозаполняет ленты по всем подпискам после загрузки в обход
+    сигналов: по одному запросу постов на автора."""
+    celebrities = set(Profile.objects.filter(
+        follower_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+    ).values_list('user_id', flat=True))
+    follows = (Follow.objects.order_by('author_id')
+               .values_list('author_id', 'user_id')
+               .iterator(chunk_size=chunk_size))
+    Post.all_objects.filter(author__in=celebrities).update(
+        merged_on_read=True)
+    for author_id, edges in groupby(follows, key=lambda edge: edge[0]):
+        if author_id in celebrities:
+            continue
+        followers = [user_id for _, user_id in edges]
+        posts = list(Post.objects.filter(author=author_id,
+                                         merged_on_read=False)
+                     .values_list('id', 'pub_date')
+                     [:settings.TIMELINE_SIZE])
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date)
+             for user_id in followers for post_id, pub_date in posts),
+            batch_size=chunk_size, ignore_conflicts=True,
+        )
+
+
+def timeline_posts(user):
+    """Посты ленты подписок: материализованные и подмешиваемые.
+
+    id выбираются UNION ALL из индекса ленты (user, pub_date) и из
+    индекса подмешиваемых постов (merged_on_read, author, pub_date),
+    а посты достаются по первичному ключу: общий индекс постов по дате
+    не просматривается. Скрытые посты отсекаются внутри подзапросов:
+    условие на hidden снаружи склоняет SQLite к индексу (hidden,
+    pub_date). Условие задано через extra(): RawSQL в pk__in Django 2.2
+    оборачивает в двойные скобки, и SQLite считает составной подзапрос
+    скалярным. LIMIT стоит в производной таблице с псевдонимом: так его
+    принимают и PostgreSQL, и MySQL, не допускающий LIMIT прямо в IN.
+    """
+    table = Post._meta.db_table
+    return Post.all_objects.extra(where=[
+        f'{table}.id IN ('
+        f'SELECT post_id FROM ('
+        f'SELECT entry.post_id FROM {TimelineEntry._meta.db_table} entry '
+        f'INNER JOIN {table} post ON post.id = entry.post_id '
+        f'WHERE entry.user_id = %s AND post.hidden = %s '
+        f'ORDER BY entry.pub_date DESC LIMIT %s) recent '
+        f'UNION ALL '
+        f'SELECT id FROM {table} '
+        f'WHERE merged_on_read = %s AND hidden = %s AND author_id IN ('
+        f'SELECT author_id FROM {Follow._meta.db_table} '
+        f'WHERE user_id = %s))'],
+        params=[user.pk, False, settings.TIMELINE_SIZE,
+                True, False, user.pk])
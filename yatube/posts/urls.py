@@ -13,7 +13,15 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
+    path('feeds/<str:fmt>/', views.index_feed, name='index_feed'),
+    path('group/<slug:slug>/feed/<str:fmt>/', views.group_feed,
+         name='group_feed'),
+    path('profile/<str:username>/feed/<str:fmt>/', views.profile_feed,
+         name='profile_feed'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,75 +1,186 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.http import JsonResponse
+from django.utils.http import urlencode
+
+from core.db.routers import read_from_replica, writes_primary
+from core.instrumentation import query_budget
+from core.ratelimit import rate_limit
 
 from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
+from .feeds import feed_response
+from .page_cache import cache_anonymous_page
+from .paginators import CountedPaginator, CursorPaginator
+from . import feed_cache, search, thumbnails, timeline
+
+
+def get_page(queryset, request, counter=None, approximate=False):
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+        return paginator.get_page(cursor)
+    if counter is not None:
+        paginator = CountedPaginator(
+            queryset, settings.POSTS_PER_PAGE, counter, approximate)
+    else:
+        paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def feed_version(feed, *depends_on):
+    """Токен версии ленты (и лент, от которых она зависит) для ключей
+    кэша. Ленту читают с реплики все, кроме автора изменения, которого
+    держит на основной базе cookie; собранное по отстающей реплике
+    сразу после смены кэшируется только до конца окна отставания."""
+    version = (feed_cache.combined([feed, *depends_on]) if depends_on
+               else feed_cache.version(feed))
+    return feed_cache.cache_token(version, settings.REPLICA_PIN_SECONDS)
+
+
+def group_feeds(slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('pk', flat=True).first())
+    return None if group_id is None else [f'group:{group_id}']
+
+
+def profile_feeds(username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('pk', flat=True).first())
+    return None if author_id is None else [f'profile:{author_id}']
 
 
-def get_page(queryset, page_number):
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
-    return paginator.get_page(page_number)
+def post_feeds(post_id):
+    author_id = (Post.objects.filter(pk=post_id)
+                 .values_list('author_id', flat=True).first())
+    if author_id is None:
+        return None
+    return [f'post:{post_id}', f'profile:{author_id}']
 
 
+@cache_anonymous_page(lambda: ['index'])
+@read_from_replica
+@query_budget(5)
 def index(request):
+    version = feed_version('index')
     page_obj = get_page(
         Post.objects
-        .select_related('author'), request.GET.get('page'))
+        .select_related('author', 'group'), request, 'index',
+        approximate=True)
     context = {
         'page_obj': page_obj,
+        'feed_version': version,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page(group_feeds)
+@read_from_replica
+@query_budget(6)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
+    version = feed_version(f'group:{group.id}')
     page_obj = get_page(group.posts.select_related(
-        'author'), request.GET.get('page'))
+        'author'), request, f'group:{group.id}')
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': version,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page(profile_feeds)
+@read_from_replica
+@query_budget(7)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    version = feed_version(f'profile:{author.id}')
     page_obj = get_page(author.posts.select_related(
-        'group'), request.GET.get('page'))
+        'group'), request, f'author:{author.id}')
     following = request.user.is_authenticated and (
         author.following.filter(user=request.user).exists())
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'feed_version': version,
     }
     return render(request, 'posts/profile.html/', context)
 
 
+def get_comments_page(post, cursor):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE, keys=('created', 'id'),
+        descending=False)
+    return paginator.get_page(cursor)
+
+
+@cache_anonymous_page(post_feeds)
+@read_from_replica
+@query_budget(5)
 def post_detail(request, post_id):
+    version = feed_version(f'post:{post_id}')
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), id=post_id)
-    comments = post.comments.select_related('author')
+        Post.objects.select_related('author__profile', 'group'),
+        id=post_id)
+    comments = get_comments_page(post, request.GET.get('comments'))
     context = {
         'form': CommentForm(),
         'post': post,
         'comments': comments,
+        'feed_version': version,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_from_replica
+@query_budget(2)
+def post_comments(request, post_id):
+    version = feed_version(f'post:{post_id}')
+    post = get_object_or_404(Post, id=post_id)
+    comments = get_comments_page(post, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+        'feed_version': version,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+@query_budget(15)
 @login_required
+@rate_limit('post')
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', post.author)
     return render(request, "posts/create_post.html", {'form': form})
 
 
+@query_budget(20)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
@@ -79,13 +190,17 @@ def post_edit(request, post_id):
                         instance=post)
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('posts:post_detail', post_id)
         return render(request, 'posts/create_post.html',
                       {'form': form, 'is_edit': True, })
     return redirect('posts:post_detail', post_id)
 
 
+@query_budget(5)
 @login_required
+@rate_limit('comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -97,19 +212,68 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_from_replica
+@query_budget(6)
 @login_required
 def follow_index(request):
+    version = feed_version(
+        f'follow:{request.user.id}',
+        *(f'author:{author_id}' for author_id
+          in timeline.followed_celebrities(request.user.id)))
     page_obj = get_page(
-        Post.objects
-        .select_related('author', 'group')
-        .filter(author__following__user=request.user), request.GET.get('page'))
+        timeline.timeline_posts(request.user)
+        .select_related('author', 'group'), request)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_version': version,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@read_from_replica
+@query_budget(1)
+def index_feed(request, fmt):
+    return feed_response(request, fmt, 'index', 'Последние обновления',
+                         reverse('posts:index_path'), Post.objects.all())
+
+
+@read_from_replica
+@query_budget(2)
+def group_feed(request, slug, fmt):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, fmt, f'group:{group.id}', group.title,
+                         reverse('posts:group_list', args=(slug,)),
+                         group.posts.all())
+
+
+@read_from_replica
+@query_budget(2)
+def profile_feed(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, fmt, f'profile:{author.id}',
+                         f'Записи {author.username}',
+                         reverse('posts:profile', args=(username,)),
+                         author.posts.all())
+
+
+@read_from_replica
+@query_budget(5)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.SearchResults(query),
+                          settings.POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'query_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(13)
 @login_required
+@rate_limit('follow', methods=None)
+@writes_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user == author:
@@ -118,7 +282,10 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(8)
 @login_required
+@rate_limit('follow', methods=None)
+@writes_primary
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
@@ -0,0 +1,15 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Any ASGI 3 server can run it, e.g. ``uvicorn yatube.asgi:application``.
+Django 2.2 has no ASGI support of its own; see core.asgi.
+"""
+
+import os
+
+from core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = get_asgi_application()
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from core.cache import cache_config
+from core.db import database_config, replica_configs
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -47,10 +50,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +71,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,17 +87,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Размер пула потоков, в котором yatube.asgi выполняет запросы.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Бэкенд, реплики, постоянные соединения, пул и прагмы SQLite задаются
+# переменными окружения DB_* и SQLITE_*, см. core.db.
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_config(os.path.join(BASE_DIR, 'db.sqlite3')),
 }
+DATABASES.update(replica_configs(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+# Сколько секунд после записи читать из основной базы.
+REPLICA_PIN_SECONDS = 10
 
 
 # Password validation
@@ -140,14 +153,66 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Сколько номеров страниц выводить в приблизительном режиме пагинатора.
+PAGINATOR_PAGE_RANGE = 10
+# Keyset-пагинация (?cursor=) для лент вместо ?page=.
+POSTS_CURSOR_PAGINATION = False
+# Сколько хранить число постов ленты для пагинатора: сигналы сдвигают
+# его сразу, а истечение исправляет накопившееся расхождение.
+POST_COUNT_TIMEOUT = 60 * 60
+# Длина материализованной ленты подписок и порог подписчиков,
+# после которого посты автора подмешиваются в ленту при чтении.
+TIMELINE_SIZE = 800
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
+# Сколько хранить целые страницы для анонимов; сигналы инвалидируют
+# их раньше при изменении содержимого.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 3
+# Число постов в лентах Atom/RSS/JSON и срок хранения записей ленты.
+FEED_ITEMS = 20
+FEED_ENTRY_TIMEOUT = 60 * 60 * 24
+# Размер страницы списков JSON API.
+API_PAGE_SIZE = 20
+# Ограничение частоты записей: (ёмкость ведра, период наполнения в
+# секундах) для каждой группы views; None отключает ограничение.
+RATE_LIMITS = {
+    'post': (10, 60),
+    'comment': (30, 60),
+    'follow': (60, 60),
+    'token': (5, 60),
+}
+
+# Списки админки без фильтров берут число строк из статистики базы,
+# если оно больше этого порога.
+ADMIN_EXACT_COUNT_LIMIT = 100000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Миниатюры картинок постов создаются в фоне после сохранения поста.
+POST_THUMBNAIL_SIZES = ('960x339',)
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки постов проверяются, уменьшаются и перекодируются
+# до сохранения (posts.images). POST_IMAGE_FORMAT — 'JPEG' или 'WEBP'.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_FORMAT = 'JPEG'
+POST_IMAGE_QUALITY = 85
+# Картинки постов хранятся по хешу содержимого (posts.storage). Файл без
+# ссылок удаляется, если его не записывали дольше этого числа секунд.
+MEDIA_GC_GRACE = 60 * 60
+
+# Массовая модерация из админки: фоновые задачи по одной, пачками.
+MODERATION_ASYNC = True
+MODERATION_WORKERS = 1
+MODERATION_BATCH_SIZE = 500
+MODERATION_PROGRESS_TIMEOUT = 60 * 60 * 24
+
+# Общий для процессов кэш и LRU процесса перед ним задаются
+# переменными окружения CACHE_*, см. core.cache.
+CACHES = cache_config(os.path.join(BASE_DIR, 'cache'))